@@ -0,0 +1,114 @@
+# USAGE
+# Get everything the interface plots for several methods at once. The exact
+# solution is computed once and shared by all methods.
+
+import numpy as np
+
+import exact_solution
+import instrumentation
+import rhs
+
+
+def cached(store, method, kind, params, compute, record=None):
+    """
+    Load a result from the store or compute and save it. With a record of
+    an instrumented method, the cost of the computation is saved too and
+    added to the record when the result is loaded.
+    :param store: store.ResultStore or None to always compute
+    :param method: NumericalSolution instance
+    :param kind: name of the computation, also the phase of its cost
+    :param params: IVP and grid as a tuple of numbers or arrays
+    :param compute: function without arguments returning a tuple of arrays
+    :param record: instrumentation.MethodStats of the method or None
+    :return: tuple of arrays
+    """
+    if store is None:
+        return compute()
+    if record is None:
+        return store.cached(method, kind, params, compute)
+    try:
+        key = store.key(method, kind, params)
+        cost_key = store.key(method, 'cost/' + kind, params)
+    except ValueError:
+        return compute()
+    arrays = store.load(key)
+    if arrays is not None:
+        record.loaded += 1
+        cost = store.load(cost_key)
+        if cost is not None:
+            record.add_cost(kind, cost[0])
+        return arrays
+    before = record.cost(kind)
+    arrays = compute()
+    store.save(key, arrays)
+    store.save(cost_key, (record.cost(kind) - before,))
+    return arrays
+
+
+def analyze(methods, x0, y0, X, n, min_n, max_n, instrumented=False,
+            store=None):
+    """
+    Calculate solutions, local errors and total errors of given methods.
+    :param methods: list of NumericalSolution instances of the same equation
+    :param x0: initial x
+    :param y0: initial y
+    :param X: the right side of an interval
+    :param n: number of steps for solutions and local errors
+    :param min_n: the minimum number of steps for total error
+    :param max_n: the maximum number of steps for total error
+    :param instrumented: collect statistics of every method
+    :param store: store.ResultStore to load and save results of methods
+    :return: vx, vy_ex, results - grid, exact solution and for every method
+    a tuple (vy, vy_er, vx_ger, vy_ger, stats)
+    """
+    if len({method.equation if callable(method.equation)
+            else rhs.identity(method.equation) for method in methods}) > 1:
+        raise ValueError("The methods solve different equations, they can "
+                         "not share the exact solution")
+    solution = methods[0].exact_solution if methods \
+        else exact_solution.ExactSolution()
+    vx, vy_ex = solution.exact(x0, y0, X, n)
+    results = [analyze_method(method, x0, y0, X, n, min_n, max_n, vy_ex,
+                              instrumented, store=store)
+               for method in methods]
+    return vx, vy_ex, results
+
+
+def analyze_method(method, x0, y0, X, n, min_n, max_n, vy_ex,
+                   instrumented=False, ns=None, store=None):
+    """
+    Calculate solution, local error and total error of one method. The
+    function can be submitted to a process pool.
+    :param method: NumericalSolution instance
+    :param n: number of steps of the solution, None to skip the solution
+    :param vy_ex: exact solution on the grid of n steps
+    :param instrumented: collect statistics of the method
+    :param ns: if given, step counts of the total error instead of
+    range(min_n, max_n)
+    :param store: store.ResultStore to load and save the results
+    :return: vy, vy_er, vx_ger, vy_ger, stats - vy and vy_er are None if
+    the solution was skipped, stats is a dict from
+    instrumentation.MethodStats.as_dict or None
+    """
+    record = None
+    if instrumented:
+        stats = instrumentation.Stats()
+        instrumentation.instrument(method, stats, 'method')
+        record = stats.method('method')
+    vy = vy_er = None
+    try:
+        if n is not None:
+            vy, vy_er = cached(store, method, 'analyze', (x0, y0, X, n),
+                               lambda: method.analyze(x0, y0, X, n,
+                                                      vy_ex)[1:], record)
+        if ns is None:
+            ns = np.arange(min_n, max_n)
+        vx_ger, vy_ger = cached(store, method, 'total_error', (x0, y0, X, ns),
+                                lambda: method.total_error(x0, y0, X,
+                                                           ns=ns), record)
+    finally:
+        if instrumented:
+            instrumentation.uninstrument(method)
+    if instrumented:
+        return vy, vy_er, vx_ger, vy_ger, stats.as_dict()['method']
+    return vy, vy_er, vx_ger, vy_ger, None
@@ -0,0 +1,15 @@
+# Usage Get the approximate solution of ODE using implicit (backward) Euler's
+# method and corresponding errors compare to exact solution
+
+from implicit import ImplicitSolution
+
+
+class BackwardEuler(ImplicitSolution):
+
+    order = 1
+
+    def find_next(self, x0, y0, h):
+        return self.newton(x0 + h, y0, h, y0)
+
+    def find_next_into(self, x0, y0, h, out):
+        out[...] = self.newton(x0 + h, y0, h, y0, system=True)
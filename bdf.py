@@ -0,0 +1,70 @@
+# Usage Get the approximate solution of ODE using the two step backward
+# differentiation formula (BDF2) and corresponding errors compare to exact
+# solution
+
+import numpy as np
+
+from implicit import ImplicitSolution, tail
+
+
+class BDF(ImplicitSolution):
+    """
+    BDF2 remembers the point of the previous step. When there is no
+    matching previous point, e.g. on the first step, it makes a backward
+    Euler step.
+    """
+
+    order = 2
+    multistep = True
+
+    def reset(self):
+        super().reset()
+        self.history = None
+        self.history_system = None
+
+    def previous(self, history, x0, y0, h):
+        """
+        Get y at x0 - h remembered from the previous step. The step only
+        continues the previous one if it starts at the point the previous
+        step ended at, so calls for other IVPs or from exact points, e.g. of
+        the local error, start with a backward Euler step.
+        :return: y at x0 - h or None
+        """
+        if history is None:
+            return None
+        px, py, qx, qy = history
+        if np.ndim(y0) != np.ndim(py) or np.ndim(x0) != np.ndim(px):
+            return None
+        if np.ndim(x0):
+            px, qx = tail(px, np.shape(x0)), tail(qx, np.shape(x0))
+            py, qy = tail(py, np.shape(y0)), tail(qy, np.shape(y0))
+            if px is None or py is None:
+                return None
+        atol = 1e-9 * np.max(np.abs(h))
+        if not np.allclose(px + h, x0, rtol=0, atol=atol) or \
+                not np.allclose(qx, x0, rtol=0, atol=atol) or \
+                not np.array_equal(qy, y0):
+            return None
+        return py
+
+    def step(self, x0, y0, h, yp, system):
+        if yp is None:
+            return self.newton(x0 + h, y0, h, y0, system)
+        return self.newton(x0 + h, (4 * y0 - yp) / 3, 2 * h / 3, 2 * y0 - yp,
+                           system)
+
+    def find_next(self, x0, y0, h):
+        yp = self.previous(self.history, x0, y0, h)
+        y1 = self.step(x0, y0, h, yp, False)
+        self.history = (np.copy(x0), np.copy(y0), np.copy(x0 + h),
+                        np.copy(y1))
+        return y1
+
+    def find_next_exact(self, x0, y0, h, yp):
+        return self.step(x0, y0, h, yp, False)
+
+    def find_next_into(self, x0, y0, h, out):
+        yp = self.previous(self.history_system, x0, y0, h)
+        y1 = self.step(x0, y0, h, yp, True)
+        self.history_system = (x0, np.copy(y0), x0 + h, np.copy(y1))
+        out[...] = y1
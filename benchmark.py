@@ -0,0 +1,194 @@
+# USAGE
+# Measure the speed of the numerical methods without the gui:
+#   python benchmark.py --output bench.json
+# Compare with an earlier run, the exit code is 1 if something got slower:
+#   python benchmark.py --baseline bench.json --tolerance 0.2
+# The import of the numerical core is timed in fresh interpreters, the exit
+# code is also 1 if it takes longer than --import-limit or loads the gui
+# libraries. numpy is imported before the timer starts, the limit is for the
+# modules of this project.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import analysis
+import euler
+import improved_euler
+import rungekutta
+
+METHODS = {
+    'euler': euler.Euler,
+    'improved_euler': improved_euler.ImprovedEuler,
+    'runge_kutta': rungekutta.RungeKutta,
+}
+
+# modules which can be used without the gui
+CORE_MODULES = ['equation', 'exact_solution', 'rhs', 'euler', 'improved_euler',
+                'rungekutta', 'explicit', 'dormand_prince', 'backward_euler',
+                'trapezoidal', 'bdf', 'analysis']
+# packages which only the gui may import
+GUI_MODULES = ['tkinter', 'matplotlib']
+# maximum time of importing CORE_MODULES in seconds
+IMPORT_LIMIT = 0.1
+
+IMPORT_CODE = """
+import sys, time
+import numpy
+start = time.perf_counter()
+import %s
+seconds = time.perf_counter() - start
+print(seconds, any(name.split('.')[0] in %r for name in sys.modules))
+"""
+
+# the initial value problem used by the gui
+X0 = 1
+Y0 = 10
+X = 15
+
+
+def measure(func, repeat):
+    """
+    Get the best wall time of several calls.
+    :param func: function without arguments
+    :param repeat: number of calls
+    :return: time of the fastest call in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def find_next_loop(method, steps):
+    h = (X - X0) / float(steps)
+    x = X0
+    y = Y0
+    for i in range(1, steps + 1):
+        y = method.find_next(x, y, h)
+        x = X0 + i * h
+
+
+def run_benchmarks(sizes, sweep_points, repeat):
+    """
+    Time find_next, get_graph, local_error and total_error of every method
+    for given numbers of steps and a full recompute of the gui.
+    :param sizes: list of numbers of steps
+    :param sweep_points: number of n sampled by the total error sweeps
+    :param repeat: number of runs of every benchmark
+    :return: dict mapping benchmark names to results
+    """
+    results = {}
+    for name, cls in METHODS.items():
+        method = cls()
+        for n in sizes:
+            seconds = measure(lambda: find_next_loop(method, n), repeat)
+            results['find_next/%s/%d' % (name, n)] = {
+                'seconds': seconds, 'steps_per_second': n / seconds}
+            results['get_graph/%s/%d' % (name, n)] = {'seconds': measure(
+                lambda: method.get_graph(X0, Y0, X, n), repeat)}
+            results['local_error/%s/%d' % (name, n)] = {'seconds': measure(
+                lambda: method.local_error(X0, Y0, X, n), repeat)}
+            results['total_error/%s/%d' % (name, n)] = {'seconds': measure(
+                lambda: method.total_error(X0, Y0, X, 10, n + 1,
+                                           log_points=sweep_points), repeat)}
+
+    # the same work as App.update with the default parameters of the gui
+    methods = [cls() for cls in METHODS.values()]
+    results['app_update'] = {'seconds': measure(
+        lambda: analysis.analyze(methods, X0, Y0, X, 10, 10, 200), repeat)}
+    return results
+
+
+def import_time(modules, repeat):
+    """
+    Time the import of modules in fresh interpreters.
+    :param modules: list of module names
+    :param repeat: number of interpreters
+    :return: time of the fastest import in seconds and whether any
+    interpreter loaded a gui library
+    """
+    best = float('inf')
+    gui = False
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c',
+             IMPORT_CODE % (', '.join(modules), GUI_MODULES)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.split()
+        best = min(best, float(output[0]))
+        gui = gui or output[1] == 'True'
+    return best, gui
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find benchmarks which became slower than in the baseline.
+    :param results: current results
+    :param baseline: results of an earlier run
+    :param tolerance: allowed relative slowdown
+    :return: list of (name, baseline seconds, current seconds)
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        before = baseline[name]['seconds']
+        if result['seconds'] > before * (1 + tolerance):
+            regressions.append((name, before, result['seconds']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of the numerical methods")
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6],
+                        help="numbers of steps")
+    parser.add_argument('--sweep-points', type=int, default=20,
+                        help="number of n in the total error sweeps")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write results to a JSON file")
+    parser.add_argument('--baseline', help="JSON file of an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="allowed relative slowdown")
+    parser.add_argument('--import-limit', type=float, default=IMPORT_LIMIT,
+                        help="maximum import time of the core in seconds")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.sweep_points, args.repeat)
+    seconds, gui = import_time(CORE_MODULES, max(args.repeat, 5))
+    results['import_core'] = {'seconds': seconds, 'loads_gui': gui}
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    status = 0
+    if seconds > args.import_limit or gui:
+        print("SLOW IMPORT of the core: %.6f s%s" % (
+            seconds, ", loads the gui libraries" if gui else ""),
+            file=sys.stderr)
+        status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print("REGRESSION %s: %.6f s -> %.6f s" % (name, before, after),
+                  file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
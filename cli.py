@@ -0,0 +1,259 @@
+# USAGE
+# Run the numerical methods without the gui and stream the points to a file:
+#   python cli.py run --method euler runge_kutta --x0 1 --y0 10 11 --X 15 \
+#       --n 10 100 --exact --output result.csv
+# Parameters can also be read from a JSON config with the same keys, e.g.
+#   {"method": ["euler"], "x0": [1], "y0": [10], "X": [15], "n": [10]}
+# The output format (csv, parquet, npy) is taken from the file extension.
+# The gui is imported only when it is started:
+#   python cli.py gui
+
+import argparse
+import csv
+import functools
+import itertools
+import json
+import sys
+
+import numpy as np
+
+import dormand_prince
+import euler
+import explicit
+import improved_euler
+import rungekutta
+from equation import EQUATION
+
+METHODS = {
+    'euler': euler.Euler,
+    'improved_euler': improved_euler.ImprovedEuler,
+    'runge_kutta': rungekutta.RungeKutta,
+    'dormand_prince': dormand_prince.DormandPrince,
+}
+# other explicit Runge-Kutta methods, defined by their tableaux
+for _tableau in (explicit.RALSTON, explicit.RK3, explicit.RK38, explicit.RK5,
+                 explicit.RK8):
+    METHODS[_tableau.name.lower()] = functools.partial(
+        explicit.ExplicitSolution, tableau=_tableau)
+
+COLUMNS = ['method', 'x0', 'y0', 'X', 'n', 'i', 'x', 'y']
+EXACT_COLUMNS = ['exact', 'error']
+
+
+class CsvWriter:
+    def __init__(self, path, columns, rows):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+        self.columns = columns
+
+    def write(self, chunk):
+        rows = zip(*(itertools.repeat(chunk[c]) if np.ndim(chunk[c]) == 0
+                     else chunk[c].tolist() for c in self.columns))
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path, columns, rows):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Writing parquet files requires pyarrow")
+        self.pyarrow = pyarrow
+        self.writer = None
+        self.path = path
+        self.columns = columns
+
+    def write(self, chunk):
+        size = len(chunk['x'])
+        # the method name is stored once per chunk as a dictionary column
+        table = self.pyarrow.table({
+            c: self.pyarrow.DictionaryArray.from_arrays(
+                np.zeros(size, dtype=np.int32), [chunk[c]])
+            if isinstance(chunk[c], str) else np.broadcast_to(chunk[c], size)
+            for c in self.columns})
+        if self.writer is None:
+            self.writer = self.pyarrow.parquet.ParquetWriter(self.path,
+                                                             table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class NpyWriter:
+    def __init__(self, path, columns, rows):
+        dtype = [(c, 'U16' if c == 'method' else 'i8' if c in ('n', 'i')
+                  else 'f8') for c in columns]
+        self.array = np.lib.format.open_memmap(path, mode='w+',
+                                               dtype=dtype, shape=(rows,))
+        self.position = 0
+
+    def write(self, chunk):
+        size = len(chunk['x'])
+        part = self.array[self.position:self.position + size]
+        for c in self.array.dtype.names:
+            part[c] = chunk[c]
+        self.position += size
+
+    def close(self):
+        self.array.flush()
+        del self.array
+
+
+WRITERS = {'csv': CsvWriter, 'parquet': ParquetWriter, 'npy': NpyWriter}
+
+
+def chunks(method, name, ivps, n, chunk_size, exact):
+    """
+    Solve the IVPs with n steps in batches and yield the points as columns.
+    Trajectories longer than chunk_size and those of adaptive methods are
+    solved one at a time and streamed in parts, so the memory does not
+    depend on n.
+    :param method: NumericalSolution instance
+    :param name: name of the method for the method column
+    :param ivps: array of shape (count, 3) with x0, y0, X in every row
+    :param n: number of steps
+    :param chunk_size: approximate number of points in one chunk
+    :param exact: add the exact solution and the global error
+    :return: generator of dicts mapping column names to arrays, the method
+    and n columns are single values for the whole chunk
+    """
+    if n + 1 > chunk_size or method.adaptive:
+        for x0, y0, X in ivps.tolist():
+            i = 0
+            for vx, vy in method.iter_graph(x0, y0, X, n, chunk_size):
+                chunk = {'method': name, 'x0': np.full(vx.size, x0),
+                         'y0': np.full(vx.size, y0),
+                         'X': np.full(vx.size, X), 'n': n,
+                         'i': np.arange(i, i + vx.size), 'x': vx, 'y': vy}
+                if exact:
+                    add_exact(method, chunk, x0, y0, vx, vy)
+                i += vx.size
+                yield chunk
+        return
+    batch = max(1, chunk_size // (n + 1))
+    for start in range(0, len(ivps), batch):
+        x0, y0, X = ivps[start:start + batch].T
+        vx, vy = method.get_graph_batch(x0, y0, X, n)
+        shape = vx.shape
+        chunk = {
+            'method': name,
+            'x0': np.repeat(x0, n + 1),
+            'y0': np.repeat(y0, n + 1),
+            'X': np.repeat(X, n + 1),
+            'n': n,
+            'i': np.tile(np.arange(n + 1), shape[0]),
+            'x': vx.ravel(),
+            'y': vy.ravel(),
+        }
+        if exact:
+            add_exact(method, chunk, x0[:, None], y0[:, None], vx, vy)
+        yield chunk
+
+
+def add_exact(method, chunk, x0, y0, vx, vy):
+    """
+    Add the exact solution and the global error columns to a chunk.
+    :param method: NumericalSolution instance
+    :param chunk: dict of columns
+    :param x0: initial x of the IVPs
+    :param y0: initial y of the IVPs
+    :param vx: x of the points
+    :param vy: approximate y of the points
+    :return: None
+    """
+    solution = method.exact_solution
+    vy_ex = solution.general_solution(solution.solve_ivp(x0, y0), vx)
+    chunk['exact'] = vy_ex.ravel()
+    chunk['error'] = np.fabs(vy_ex - vy).ravel()
+
+
+def run(args):
+    """
+    Solve every combination of method, IVP and number of steps and write
+    the points to the output file chunk by chunk.
+    :param args: parsed command line arguments
+    :return: None
+    """
+    ivps = np.array(list(itertools.product(args.x0, args.y0, args.X)),
+                    dtype=float)
+    fmt = args.format or args.output.rsplit('.', 1)[-1]
+    if fmt not in WRITERS:
+        raise SystemExit("Unknown output format %r" % fmt)
+    columns = COLUMNS + (EXACT_COLUMNS if args.exact else [])
+    rows = len(args.method) * len(ivps) * sum(n + 1 for n in args.n)
+    writer = WRITERS[fmt](args.output, columns, rows)
+    try:
+        for name in args.method:
+            method = METHODS[name](equation=args.equation)
+            for n in args.n:
+                for chunk in chunks(method, name, ivps, n, args.chunk_size,
+                                    args.exact):
+                    writer.write(chunk)
+    finally:
+        writer.close()
+
+
+def parse_args(argv):
+    """
+    Parse the command line, values from --config are used as defaults.
+    :param argv: list of command line arguments
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Numerical methods for solving ODEs")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="solve IVPs to a file")
+    run_parser.add_argument('--config', help="JSON file with parameters")
+    run_parser.add_argument('--method', nargs='+', choices=sorted(METHODS),
+                            default=['euler', 'improved_euler',
+                                     'runge_kutta'])
+    run_parser.add_argument('--equation', default=EQUATION,
+                            help="right side f(x, y) of ODE")
+    run_parser.add_argument('--x0', nargs='+', type=float, default=[1.0])
+    run_parser.add_argument('--y0', nargs='+', type=float, default=[10.0])
+    run_parser.add_argument('--X', nargs='+', type=float, default=[15.0])
+    run_parser.add_argument('--n', nargs='+', type=int, default=[10])
+    run_parser.add_argument('--n-range', nargs=2, type=int,
+                            metavar=('MIN_N', 'MAX_N'),
+                            help="use every n in range(MIN_N, MAX_N)")
+    run_parser.add_argument('--exact', action='store_true',
+                            help="add the exact solution and the error")
+    run_parser.add_argument('--chunk-size', type=int, default=1 << 16,
+                            help="number of points written at once")
+    run_parser.add_argument('--output', help="csv, parquet or npy file")
+    run_parser.add_argument('--format', choices=sorted(WRITERS))
+    commands.add_parser('gui', help="open the gui")
+
+    args, _ = parser.parse_known_args(argv)
+    if getattr(args, 'config', None):
+        with open(args.config) as f:
+            run_parser.set_defaults(**json.load(f))
+    args = parser.parse_args(argv)
+    if args.command != 'run':
+        return args
+    if args.output is None:
+        parser.error("the output file is required")
+    if args.n_range:
+        args.n = list(range(*args.n_range))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'gui':
+        # tkinter and matplotlib are loaded only for the gui
+        import interface
+        interface.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# USAGE
+# Reduce the number of points of a curve before plotting it. Every pixel
+# column keeps the minimum and the maximum of the curve, so the picture looks
+# the same as with all points.
+
+import numpy as np
+
+
+def minmax_decimate(vx, vy, xmin, xmax, width):
+    """
+    Reduce a curve to about 2 * width points inside [xmin, xmax].
+    :param vx: increasing x coordinates
+    :param vy: y coordinates
+    :param xmin: left side of the visible interval
+    :param xmax: right side of the visible interval
+    :param width: width of the axes in pixels
+    :return: vx, vy - coordinates of the reduced curve
+    """
+    vx = np.asarray(vx, dtype=float)
+    vy = np.asarray(vy, dtype=float)
+    # keep one point beyond each side so the line reaches the border
+    start = max(np.searchsorted(vx, xmin) - 1, 0)
+    stop = min(np.searchsorted(vx, xmax, side='right') + 1, len(vx))
+    vx = vx[start:stop]
+    vy = vy[start:stop]
+    width = max(int(width), 1)
+    if len(vx) <= 4 * width:
+        return vx, vy
+
+    edges = np.unique(np.searchsorted(
+        vx, np.linspace(vx[0], vx[-1], width + 1)[:-1]))
+    low = np.fmin.reduceat(vy, edges)
+    high = np.fmax.reduceat(vy, edges)
+    x = np.concatenate(([vx[0]], np.repeat(vx[edges], 2), [vx[-1]]))
+    y = np.concatenate(([vy[0]], np.column_stack((low, high)).ravel(),
+                        [vy[-1]]))
+    return x, y
@@ -0,0 +1,212 @@
+# Usage Get the approximate solution of ODE using the adaptive Dormand-Prince
+# method (RK45) and corresponding errors compare to exact solution
+
+import numpy as np
+
+from equation import EQUATION, NumericalSolution
+
+# Butcher tableau of the Dormand-Prince 5(4) pair
+C = [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1]
+A = [[],
+     [1 / 5],
+     [3 / 40, 9 / 40],
+     [44 / 45, -56 / 15, 32 / 9],
+     [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+     [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656]]
+B = [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84]
+# difference between the 5th and the embedded 4th order weights
+E = np.array([-71 / 57600, 0, 71 / 16695, -71 / 1920, 17253 / 339200,
+              -22 / 525, 1 / 40])
+# coefficients of the 4th order continuous extension (dense output)
+P = np.array([
+    [1, -8048581381 / 2820520608, 8663915743 / 2820520608,
+     -12715105075 / 11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200 / 32700410799, -68118460800 / 10900136933,
+     87487479700 / 32700410799],
+    [0, -1754552775 / 470086768, 14199869525 / 1410260304,
+     -10690763975 / 1880347072],
+    [0, 127303824393 / 49829197408, -318862633887 / 49829197408,
+     701980252875 / 199316789632],
+    [0, -282668133 / 205662961, 2019193451 / 616988883,
+     -1453857185 / 822651844],
+    [0, 40617522 / 29380423, -110615467 / 29380423,
+     69997945 / 29380423]])
+
+
+class DormandPrince(NumericalSolution):
+
+    order = 5
+    evaluations = 6
+    adaptive = True
+
+    def __init__(self, equation=EQUATION, rtol=1e-6, atol=1e-9):
+        """
+        :param equation: right side f(x, y) of ODE
+        :param rtol: relative tolerance of the adaptive integration
+        :param atol: absolute tolerance of the adaptive integration
+        """
+        super().__init__(equation)
+        self.rtol = rtol
+        self.atol = atol
+        self.f_evals = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def identity(self):
+        identity = super().identity()
+        identity.update(rtol=self.rtol, atol=self.atol)
+        return identity
+
+    def stages(self, x0, y0, h, k1):
+        """
+        Calculate the stages of one Dormand-Prince step.
+        :param x0: x at the beginning of the step
+        :param y0: y at the beginning of the step
+        :param h: step size
+        :param k1: f(x0, y0), reused from the previous step
+        :return: k, y1 - list of the six stages and 5th order approximation
+        """
+        k = [k1]
+        for i in range(1, 6):
+            dy = sum(a * kj for a, kj in zip(A[i], k))
+            k.append(self.f(x0 + C[i] * h, y0 + h * dy))
+        y1 = y0 + h * sum(b * kj for b, kj in zip(B, k))
+        return k, y1
+
+    def find_next(self, x0, y0, h):
+        return self.stages(x0, y0, h, self.f(x0, y0))[1]
+
+    def initial_step(self, x0, y0, X, k1):
+        """
+        Guess the size of the first step from the scale of y and y'.
+        :return: initial step size, positive also when X < x0
+        """
+        scale = self.atol + self.rtol * abs(y0)
+        d0 = abs(y0) / scale
+        d1 = abs(k1) / scale
+        if d0 < 1e-5 or d1 < 1e-5:
+            h = 1e-6
+        else:
+            h = 0.01 * d0 / d1
+        return min(h, abs(X - x0))
+
+    def solve(self, x0, y0, X):
+        """
+        Integrate from x0 to X adapting the step size to rtol and atol. The
+        last stage of an accepted step is the first stage of the next one.
+        X may be smaller than x0, then the steps go backwards.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the end of an interval
+        :return: vx, vy, vq - accepted points and coefficients of the dense
+        output polynomial on every step
+        """
+        vx = [x0]
+        vy = [y0]
+        vq = []
+        x = x0
+        y = y0
+        k1 = self.f(x, y)
+        self.f_evals = 1
+        self.accepted = 0
+        self.rejected = 0
+        direction = 1.0 if X >= x0 else -1.0
+        h = direction * self.initial_step(x0, y0, X, k1)
+        min_h = 1e-12 * max(abs(x0), abs(X), 1)
+        while direction * (X - x) > 0:
+            last = abs(h) >= abs(X - x)
+            if last:
+                h = X - x
+            k, y1 = self.stages(x, y, h, k1)
+            k7 = self.f(x + h, y1)
+            self.f_evals += 6
+            k = np.array(k + [k7])
+
+            scale = self.atol + self.rtol * max(abs(y), abs(y1))
+            err = abs(h * np.dot(E, k)) / scale
+            if err <= 1:
+                vq.append(np.dot(k, P))
+                x = X if last else x + h
+                y = y1
+                k1 = k7
+                vx.append(x)
+                vy.append(y)
+                self.accepted += 1
+                factor = 10 if err == 0 else min(10, 0.9 * err ** -0.2)
+            elif np.isfinite(err):
+                self.rejected += 1
+                factor = max(0.2, 0.9 * err ** -0.2)
+            else:
+                self.rejected += 1
+                factor = 0.2
+            h *= factor
+            if abs(h) < min_h:
+                raise ValueError("Step size became too small at x = %g" % x)
+        return np.array(vx), np.array(vy), np.array(vq).reshape(-1, 4)
+
+    def interpolate(self, vx, vy, vq, xs):
+        """
+        Evaluate the dense output of an adaptive solution.
+        :param vx: accepted points returned by solve
+        :param vy: values at the accepted points
+        :param vq: dense output coefficients returned by solve
+        :param xs: points between vx[0] and vx[-1] to evaluate at
+        :return: approximate values of y at xs
+        """
+        xs = np.asarray(xs, dtype=float)
+        # backward solutions have decreasing points
+        sign = 1.0 if vx[-1] >= vx[0] else -1.0
+        i = np.clip(np.searchsorted(sign * vx, sign * xs, side='right') - 1,
+                    0, len(vq) - 1)
+        h = vx[i + 1] - vx[i]
+        theta = (xs - vx[i]) / h
+        p = np.cumprod(np.repeat(theta[..., None], 4, axis=-1), axis=-1)
+        return vy[i] + h * np.sum(vq[i] * p, axis=-1)
+
+    def get_graph_at(self, x0, y0, xs):
+        """
+        Calculate the approximate solution on an arbitrary grid.
+        :param x0: initial x
+        :param y0: initial y
+        :param xs: points to evaluate at, increasing from x0 or decreasing
+        from x0 to integrate backwards
+        :return: vx, vy - coordinates of approximate solution
+        """
+        xs = np.asarray(xs, dtype=float)
+        vx, vy, vq = self.solve(x0, y0, xs[-1])
+        if len(vq) == 0:
+            return xs, np.full(xs.shape, float(y0))
+        return xs, self.interpolate(vx, vy, vq, xs)
+
+    def get_graph(self, x0, y0, X, n):
+        h = (X - x0) / float(n)
+        return self.get_graph_at(x0, y0, x0 + np.arange(n + 1) * h)
+
+    def iter_graph(self, x0, y0, X, n, chunk_size=None):
+        """
+        Calculate the approximate solution like get_graph in parts. The
+        adaptive solution is computed once, the parts of the grid are
+        interpolated when they are needed.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param chunk_size: if given, yield arrays of that many points
+        :return: generator of (x, y) pairs or of (vx, vy) arrays
+        """
+        parts = self.iter_parts(x0, y0, X, n, chunk_size or 4096)
+        if chunk_size is not None:
+            return parts
+        return (point for vx, vy in parts
+                for point in zip(vx.tolist(), vy.tolist()))
+
+    def iter_parts(self, x0, y0, X, n, chunk_size):
+        h = (X - x0) / float(n)
+        vx, vy, vq = self.solve(x0, y0, X)
+        for start in range(0, n + 1, chunk_size):
+            xs = x0 + np.arange(start, min(start + chunk_size, n + 1)) * h
+            if len(vq) == 0:
+                yield xs, np.full(xs.shape, float(y0))
+            else:
+                yield xs, self.interpolate(vx, vy, vq, xs)
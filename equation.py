@@ -1,31 +1,168 @@
 # USAGE Get the original equation You can put your own differential equation
-# here in the return of function f. Be aware that the equation is supposed to
-# be in the form y' = f(x, y). You need to put f(x, y) in the function f. If
-# you want to plot the exact solution you also need to modify file exact
-# solution. There you should an exact solution and express constant of your
-# equation for further calculation of IVP.
+# in EQUATION or pass it to the constructor of a method, either as a string
+# such as "sqrt(y - x) / sqrt(x) + 1" or as a function f(x, y). Be aware that
+# the equation is supposed to be in the form y' = f(x, y). The exact solution
+# in file exact solution is only known for EQUATION, errors of other
+# equations are measured against an accurate reference solution (file
+# reference). If you change EQUATION you should modify the exact solution
+# and express constant of your equation for further calculation of IVP.
 
-from math import sqrt
+import contextlib
 import math
+
+import numpy as np
+
 import exact_solution
+import reference
+import rhs
+from trajectory import ErrorCurve, Trajectory
+
+EQUATION = "sqrt(y - x) / sqrt(x) + 1"
+# total error sweeps with more points compute the exact solution on the fly
+# instead of caching it
+SWEEP_CACHE_LIMIT = 10 ** 7
+# fraction of the tolerance aimed at by solve_to_tolerance
+TOLERANCE_SAFETY = 0.5
+# step counts of total_error are integrated as one batch when at least that
+# many of them lie between n / 2 and n, an array step costs about as much
+# as this many scalar steps
+BATCH_DENSITY = 16
+
+
+def chunks(points, chunk_size):
+    """
+    Group (x, y) pairs into arrays.
+    :param points: iterable of (x, y) pairs
+    :param chunk_size: maximum number of points in one chunk
+    :return: generator of (vx, vy) arrays
+    """
+    vx = np.empty(chunk_size)
+    vy = np.empty(chunk_size)
+    k = 0
+    for vx[k], vy[k] in points:
+        k += 1
+        if k == chunk_size:
+            yield vx, vy
+            vx = np.empty(chunk_size)
+            vy = np.empty(chunk_size)
+            k = 0
+    if k:
+        yield vx[:k], vy[:k]
 
 
 class NumericalSolution:
-    def __init__(self):
-        self.exact_solution = exact_solution.ExactSolution()
+    # order of accuracy of the method, used by Richardson extrapolation
+    order = None
+    # evaluations of f per step, used to estimate the cost of a computation
+    evaluations = 1
+    # the step depends on the previous steps, so steps from different
+    # starting points can not be made at once
+    multistep = False
+    # the method chooses its own steps and interpolates the grid, so only
+    # get_graph and iter_graph give its solution, the batched and the
+    # single steps are steps of the underlying fixed step formula
+    adaptive = False
 
-    def f(self, x, y):
+    def __init__(self, equation=EQUATION):
         """
-        Get the right side of ODE
-        :param x: x-coordinate
-        :param y: y-coordinate
-        :return: right side of ODE
+        :param equation: right side f(x, y) of ODE, an expression string or
+        a function of x and y
         """
-        return sqrt(y - x) / sqrt(x) + 1
+        if not isinstance(equation, str) and not callable(equation):
+            # the reference solution is only calculated for one equation
+            self.exact_solution = exact_solution.UnknownSolution()
+        elif callable(equation) or \
+                rhs.identity(equation) != rhs.identity(EQUATION):
+            self.exact_solution = reference.ReferenceSolution(equation)
+        else:
+            self.exact_solution = exact_solution.ExactSolution()
+        self.equation = equation
+        # compiled right side of ODE, accepts numbers and numpy arrays
+        self.f = rhs.compile_rhs(equation)
+
+    def __getstate__(self):
+        # compiled kernels can not be pickled, they are rebuilt on loading
+        state = self.__dict__.copy()
+        del state['f']
+        state.pop('buffers', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.f = rhs.compile_rhs(self.equation)
+
+    def identity(self):
+        """
+        Describe the method and the equation, results of two instances with
+        equal identity are the same.
+        :return: dict of the class, the equation and the options
+        """
+        return {'method': type(self).__name__,
+                'equation': rhs.identity(self.equation)}
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    @contextlib.contextmanager
+    def counting(self):
+        """
+        Count the points at which f is evaluated inside the with block.
+        :return: context manager yielding a list with the count
+        """
+        count = [0]
+        f = self.f
+
+        def counted(x, y):
+            count[0] += np.size(y)
+            return f(x, y)
+
+        self.f = counted
+        try:
+            yield count
+        finally:
+            self.f = f
 
     def find_next(self, x0, y0, h):
         pass
 
+    def find_next_into(self, x0, y0, h, out):
+        """
+        Make one step and write the result into a preallocated array.
+        Methods override it to keep their stages in reusable buffers.
+        :param x0: x at the beginning of the step
+        :param y0: array of y at the beginning of the step
+        :param h: step size
+        :param out: array of the same shape as y0 for the result
+        :return: None
+        """
+        out[...] = self.find_next(x0, y0, h)
+
+    def find_next_exact(self, x0, y0, h, yp):
+        """
+        Make steps from points of the exact solution, e.g. for the local
+        error. Multistep methods override it to take the previous point from
+        the exact solution instead of their history.
+        :param x0: x at the beginning of the steps
+        :param y0: exact y at x0
+        :param h: step size
+        :param yp: exact y at x0 - h, None on the first step
+        :return: y at x0 + h
+        """
+        return self.find_next(x0, y0, h)
+
+    def stage_buffers(self, shape, count):
+        """
+        Get work arrays for the stages of a step, allocated once per shape.
+        :param shape: shape of y
+        :param count: number of arrays
+        :return: list of arrays
+        """
+        buffers = self.__dict__.setdefault('buffers', {})
+        if (shape, count) not in buffers:
+            buffers[shape, count] = [np.empty(shape) for _ in range(count)]
+        return buffers[shape, count]
+
     def get_graph(self, x0, y0, X, n):
         """
         Calculate the approximate solution of given ODE and IVP :param f:
@@ -44,6 +181,114 @@ class NumericalSolution:
             vx[i] = x = x0 + i * h
         return vx, vy
 
+    def trajectory(self, x0, y0, X, n):
+        """
+        Calculate the approximate solution like get_graph into a float64
+        array instead of lists.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :return: Trajectory on the shared grid of the exact solution
+        """
+        h = (X - x0) / float(n)
+        vy = np.empty(n + 1)
+        with self.counting() as count:
+            vy[0] = y = y0
+            for i in range(1, n + 1):
+                vy[i] = y = self.find_next(x0 + (i - 1) * h, y, h)
+        return Trajectory(self.exact_solution.grid(x0, X, n), vy, self.name,
+                          h, n, count[0])
+
+    def iter_graph(self, x0, y0, X, n, chunk_size=None):
+        """
+        Calculate the approximate solution lazily, point by point, so the
+        memory does not depend on n and the consumer can stop at any time.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param chunk_size: if given, yield arrays of that many points
+        :return: generator of (x, y) pairs or of (vx, vy) arrays
+        """
+        points = self.iter_points(x0, y0, X, n)
+        return points if chunk_size is None else chunks(points, chunk_size)
+
+    def iter_points(self, x0, y0, X, n):
+        h = (X - x0) / float(n)
+        x = x0
+        y = y0
+        yield x, y
+        for i in range(1, n + 1):
+            y = self.find_next(x, y, h)
+            x = x0 + i * h
+            yield x, y
+
+    def get_graph_system(self, x0, y0, X, n):
+        """
+        Calculate the approximate solution of a system y' = F(x, y) where y
+        is a vector. The whole trajectory is written into one preallocated
+        array, so the steps do not allocate new states.
+        :param x0: initial x
+        :param y0: initial vector y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :return: vx, vy - array of n + 1 points and array of shape
+        (n + 1, len(y0)) with the approximate solution
+        """
+        y0 = np.asarray(y0, dtype=float)
+        h = (X - x0) / float(n)
+        vx = x0 + np.arange(n + 1) * h
+        vy = np.empty((n + 1,) + y0.shape)
+        vy[0] = y0
+        for i in range(1, n + 1):
+            self.find_next_into(vx[i - 1], vy[i - 1], h, vy[i])
+        return vx, vy
+
+    def get_graph_batch(self, x0, y0, X, n):
+        """
+        Calculate the approximate solutions of many IVPs at once. All
+        trajectories are advanced together with numpy array operations.
+        :param x0: initial x (number or array)
+        :param y0: initial y (number or array)
+        :param X: the right side of an interval (number or array)
+        :param n: number of steps, shared by all trajectories
+        :return: vx, vy - arrays of shape (batch, n + 1), one row per IVP
+        """
+        x0, y0, X = np.broadcast_arrays(np.atleast_1d(np.asarray(x0, float)),
+                                        np.atleast_1d(np.asarray(y0, float)),
+                                        np.atleast_1d(np.asarray(X, float)))
+        vx = np.empty((x0.size, n + 1))
+        vy = np.empty((x0.size, n + 1))
+        h = (X - x0) / float(n)
+        vx[:, 0] = x = x0
+        vy[:, 0] = y = y0
+        for i in range(1, n + 1):
+            vy[:, i] = y = self.find_next(x, y, h)
+            vx[:, i] = x = x0 + i * h
+        return vx, vy
+
+    def analyze(self, x0, y0, X, n, vy_ex=None):
+        """
+        Calculate the approximate solution and its local error. The local
+        error is calculated for the whole grid at once like in
+        local_error_array.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param vy_ex: exact solution on the grid, computed if not given
+        :return: vx, vy, vy_er - grid, approximate solution and local error
+        """
+        h = (X - x0) / float(n)
+        vx = self.exact_solution.grid(x0, X, n)
+        vy = np.empty(n + 1)
+        vy[0] = y = y0
+        for i in range(1, n + 1):
+            vy[i] = y = self.find_next(x0 + (i - 1) * h, y, h)
+        _, vy_er = self.local_error_array(x0, y0, X, n, vy_ex=vy_ex)
+        return vx, vy, vy_er
+
     def local_error(self, x0, y0, X, n):
         """
         Get the local error for the approximation method
@@ -53,50 +298,259 @@ class NumericalSolution:
         :param n: number of steps
         :return: vx, vy - coordinates of local error
         """
-        vx = [0] * (n + 1)
-        vy = [0] * (n + 1)
-        h = (X - x0) / float(n)
+        vx, vy = self.local_error_array(x0, y0, X, n)
+        vx = vx.tolist()
         vx[0] = 0
-        vy[0] = 0
+        return vx, vy.tolist()
 
-        c = self.exact_solution.solve_ivp(x0, y0)
-        x_prev = x0
-        y_prev = y0
-        for i in range(1, n + 1):
-            vx[i] = x = x0 + i * h
-            y = self.exact_solution.general_solution(c, x)
-            vy[i] = math.fabs(y - self.find_next(x_prev, y_prev, h))
-            x_prev = x
-            y_prev = y
+    def local_error_array(self, x0, y0, X, n, chunk_size=None, vy_ex=None):
+        """
+        Calculate the local error on the whole grid at once. Every step
+        starts from the exact solution, so the steps do not depend on each
+        other and are made by one call of find_next on arrays.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param chunk_size: if given, make at most that many steps at once,
+        which bounds the memory of the stages for very large n
+        :param vy_ex: exact solution on the grid, computed if not given
+        :return: vx, vy - arrays of the grid and the local error, vy[0] is 0
+        """
+        h = (X - x0) / float(n)
+        vx = self.exact_solution.grid(x0, X, n)
+        if vy_ex is None:
+            vy_ex = self.exact_solution.exact(x0, y0, X, n)[1]
+        vy_ex = np.asarray(vy_ex, dtype=float)
+        vy = np.zeros(n + 1)
+        first = 0
+        if self.multistep and n > 0:
+            # the first step has no previous point
+            vy[1] = math.fabs(vy_ex[1] - self.find_next_exact(
+                vx[0], vy_ex[0], h, None))
+            first = 1
+        size = chunk_size or max(n, 1)
+        for start in range(first, n, size):
+            stop = min(start + size, n)
+            yp = vy_ex[start - 1:stop - 1] if start else None
+            y = self.find_next_exact(vx[start:stop], vy_ex[start:stop], h, yp)
+            np.fabs(vy_ex[start + 1:stop + 1] - y, out=vy[start + 1:stop + 1])
         return vx, vy
 
-    def total_error(self, x0, y0, X, min_n=10, max_n=100):
+    def local_error_curve(self, x0, y0, X, n, chunk_size=None):
+        """
+        Calculate the local error like local_error_array.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param chunk_size: if given, make at most that many steps at once
+        :return: ErrorCurve on the shared grid of the exact solution
         """
-                Get the total error for approximation method.
+        with self.counting() as count:
+            vx, vy = self.local_error_array(x0, y0, X, n, chunk_size)
+        return ErrorCurve(vx, vy, self.name, (X - x0) / float(n), n,
+                          count[0], 'local')
 
-                :param f: given equation :param x0: initial x :param y0:
-                initial y :param X: the right side of an interval for which
-                the approximation is calculated :param max_n: the maximum
-                number of iterations in the approximation :return: vx,
-                vy - the dependence of global error on the number of steps
+    def iter_local_error(self, x0, y0, X, n, chunk_size=None):
+        """
+        Calculate the local error lazily like iter_graph. Chunks are
+        calculated with one call of find_next each.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param chunk_size: if given, yield arrays of that many points
+        :return: generator of (x, error) pairs or of (vx, vy) arrays
+        """
+        points = self.iter_local_points(x0, y0, X, n)
+        if chunk_size is None:
+            return points
+        if self.multistep:
+            return chunks(points, chunk_size)
+        return self.iter_local_chunks(x0, y0, X, n, chunk_size)
 
-                Args:
-                    min_n:
-                """
-        vx = []
-        vy = []
+    def iter_local_chunks(self, x0, y0, X, n, chunk_size):
+        h = (X - x0) / float(n)
+        x_prev = y_prev = None
+        for vx, vy in self.exact_solution.iter_exact(x0, y0, X, n,
+                                                     chunk_size):
+            if x_prev is None:
+                # the error at x0 is 0
+                xs, ys = vx[:-1], vy[:-1]
+                error = np.zeros(len(vx))
+                np.fabs(vy[1:] - self.find_next(xs, ys, h), out=error[1:])
+            else:
+                # the first step of a chunk starts at the end of the previous
+                xs = np.concatenate(([x_prev], vx[:-1]))
+                ys = np.concatenate(([y_prev], vy[:-1]))
+                error = np.fabs(vy - self.find_next(xs, ys, h))
+            x_prev = vx[-1]
+            y_prev = vy[-1]
+            yield vx, error
+
+    def iter_local_points(self, x0, y0, X, n):
+        h = (X - x0) / float(n)
+        exact = self.exact_solution.iter_exact(x0, y0, X, n)
+        x_prev, y_prev = next(exact)
+        yp = None
+        yield x_prev, 0.0
+        for x, y in exact:
+            yield x, math.fabs(y - self.find_next_exact(x_prev, y_prev, h,
+                                                        yp))
+            x_prev, yp = x, y_prev
+            y_prev = y
+
+    def total_error(self, x0, y0, X, min_n=10, max_n=100, log_points=None,
+                    ns=None):
+        """
+        Get the total error for approximation method. Dense runs of step
+        counts are integrated together as one batch, so such a sweep takes
+        max_n array steps instead of re-integrating from scratch for every
+        n. Sparse step counts, e.g. of a logarithmic grid, are integrated one
+        at a time with scalar steps, which are much cheaper than array steps
+        that advance only a few step counts.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval for which the approximation
+        is calculated
+        :param min_n: the minimum number of steps (inclusive)
+        :param max_n: the maximum number of steps (exclusive)
+        :param log_points: if given, sample about that many step counts on a
+        logarithmic grid instead of every n in range(min_n, max_n)
+        :param ns: if given, array of the step counts to use instead of
+        min_n, max_n and log_points, in any order
+        :return: vx, vy - the dependence of global error on the number of
+        steps
+        """
+        if ns is not None:
+            ns = np.asarray(ns, dtype=int).ravel()
+            # the sweep needs increasing step counts without repetitions
+            unique, inverse = np.unique(ns, return_inverse=True)
+            if unique.size != ns.size or (np.diff(ns) < 0).any():
+                return ns, self.total_error(x0, y0, X, ns=unique)[1][inverse]
+        elif log_points is None:
+            ns = np.arange(min_n, max_n)
+        else:
+            ns = np.unique(np.geomspace(min_n, max_n - 1, log_points)
+                           .round().astype(int))
+        vy = np.zeros(ns.size)
+        if ns.size == 0:
+            return ns, vy
 
         c = self.exact_solution.solve_ivp(x0, y0)
-        for cur_n in range(min_n, max_n):
-            x = x0
-            y = y0
-            h = (X - x0) / float(cur_n)
-            errors = []
-            for i in range(1, cur_n + 1):
-                y = self.find_next(x, y, h)
-                x = x0 + i * h
-                errors.append(
-                    math.fabs(self.exact_solution.general_solution(c, x) - y))
-            vx.append(cur_n)
-            vy.append(max(errors))
-        return vx, vy
+        # number of step counts in [n / 2, n], a batch pays off only if many
+        # of them share its array steps
+        dense = np.arange(1, ns.size + 1) - \
+            np.searchsorted(ns, ns // 2) >= BATCH_DENSITY
+        if dense.any():
+            vy[dense] = self.batch_error(x0, y0, X, ns[dense], c)
+        for k in np.flatnonzero(~dense):
+            vy[k] = self.scalar_error(x0, y0, X, int(ns[k]), c)
+        return ns, vy
+
+    def batch_error(self, x0, y0, X, ns, c):
+        """
+        Integrate all step counts together and get their global errors.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param ns: increasing array of step counts
+        :param c: constant of the exact solution returned by solve_ivp
+        :return: array of the global errors
+        """
+        vy = np.zeros(ns.size)
+        cached = ns.sum() <= SWEEP_CACHE_LIMIT
+        if cached:
+            vy_ex, offsets = self.exact_solution.sweep(x0, y0, X, ns)
+        h = (X - x0) / ns.astype(float)
+        x = np.full(ns.size, x0, dtype=float)
+        y = np.full(ns.size, y0, dtype=float)
+        for i in range(1, ns[-1] + 1):
+            # step counts smaller than i have already reached X
+            a = np.searchsorted(ns, i)
+            y[a:] = self.find_next(x[a:], y[a:], h[a:])
+            x[a:] = x0 + i * h[a:]
+            if cached:
+                exact = vy_ex[offsets[a:] + i]
+            else:
+                exact = self.exact_solution.general_solution(c, x[a:])
+            np.maximum(vy[a:], np.fabs(exact - y[a:]), out=vy[a:])
+        return vy
+
+    def scalar_error(self, x0, y0, X, n, c):
+        """
+        Integrate one step count with scalar steps and get its global error.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param c: constant of the exact solution returned by solve_ivp
+        :return: the global error
+        """
+        h = (X - x0) / float(n)
+        vy = np.empty(n)
+        x = x0
+        y = y0
+        for i in range(1, n + 1):
+            vy[i - 1] = y = self.find_next(x, y, h)
+            x = x0 + i * h
+        vy_ex = self.exact_solution.general_solution(
+            c, x0 + np.arange(1, n + 1) * h)
+        return np.max(np.fabs(vy_ex - vy))
+
+    def richardson(self, x0, y0, X, n):
+        """
+        Estimate the global error by step doubling and improve the solution
+        with Richardson extrapolation.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps of the coarse solution
+        :return: vx, vy, error - grid of n steps, extrapolated solution on it
+        and the estimated global error of the solution with 2n steps
+        """
+        if self.order is None:
+            raise ValueError("The order of %s is unknown"
+                             % type(self).__name__)
+        vx, vy_n = self.get_graph_batch(x0, y0, X, n)
+        _, vy_2n = self.get_graph_batch(x0, y0, X, 2 * n)
+        difference = (vy_2n[0, ::2] - vy_n[0]) / (2 ** self.order - 1)
+        return vx[0], vy_2n[0, ::2] + difference, np.max(np.abs(difference))
+
+    def solve_to_tolerance(self, x0, y0, X, tol, n=10, max_n=10 ** 6):
+        """
+        Find the smallest number of steps for which the global error is
+        estimated to be below tol. The number of steps is doubled until the
+        step doubling estimate meets tol, then the error model C * h^order
+        predicts the cheapest n reaching TOLERANCE_SAFETY * tol.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param tol: required global error
+        :param n: initial number of steps
+        :param max_n: the maximum number of steps to try
+        :return: n, (vx, vy), (vx_r, vy_r) - the cheapest number of steps,
+        approximate solution with n steps and the extrapolated solution
+        :raise ValueError: if the error estimate is not finite or tol needs
+        more than max_n steps
+        """
+        while True:
+            vx_r, vy_r, error = self.richardson(x0, y0, X, n)
+            if not np.isfinite(error):
+                raise ValueError("The error estimate with %d steps is %g, "
+                                 "the solution is not finite" % (n, error))
+            if error <= tol:
+                break
+            if 4 * n > max_n:
+                raise ValueError("Tolerance %g needs more than %d steps"
+                                 % (tol, max_n))
+            n *= 2
+        best = 2 * n
+        if error > 0:
+            # the model and the estimate are only asymptotically exact, so
+            # the prediction aims below tol
+            best = int(math.ceil(2 * n * (
+                error / (TOLERANCE_SAFETY * tol)) ** (1.0 / self.order)))
+        vx, vy = self.get_graph_batch(x0, y0, X, best)
+        return best, (vx[0], vy[0]), (vx_r, vy_r)
@@ -1,10 +1,11 @@
 # Usage Get the approximate solution of ODE using Euler's method and
 # corresponding errors compare to exact solution
 
-from equation import NumericalSolution
+from explicit import EULER, ExplicitSolution
 
 
-class Euler(NumericalSolution):
+class Euler(ExplicitSolution):
 
-    def find_next(self, x0, y0, h):
-        return y0 + h * self.f(x0, y0)
+    order = 1
+    evaluations = 1
+    tableau = EULER
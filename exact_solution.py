@@ -1,27 +1,229 @@
 # USAGE
 # Get coordinates of exact solution of differential equation
-import math
+from collections import OrderedDict
+
+import numpy as np
+
+from trajectory import Trajectory
+
+
+class ExactCache:
+    """
+    Least recently used cache for arrays of exact solution. The grids are
+    identified by IVP and number of steps.
+    """
+
+    def __init__(self, max_size=64, max_bytes=1 << 28):
+        """
+        :param max_size: maximum number of cached grids, 0 disables caching
+        :param max_bytes: maximum total size of the cached arrays in bytes
+        """
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """
+        Get the cached value or compute and remember it.
+        :param key: hashable description of the grid
+        :param compute: function without arguments calculating the value
+        :return: cached or computed value
+        """
+        if key in self.items:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return self.items[key]
+        self.misses += 1
+        value = compute()
+        if self.max_size > 0:
+            self.items[key] = value
+            self.evict()
+        return value
+
+    def nbytes(self):
+        """
+        Sum the sizes of the cached values. Values may grow while they are
+        cached, e.g. reference solutions, so the sizes are not remembered.
+        :return: size in bytes
+        """
+        return sum(nbytes(value) for value in self.items.values())
+
+    def evict(self):
+        """
+        Remove the least recently used values until both limits are met.
+        :return: None
+        """
+        while len(self.items) > max(self.max_size, 0):
+            self.items.popitem(last=False)
+        size = self.nbytes()
+        while self.items and size > self.max_bytes:
+            size -= nbytes(self.items.popitem(last=False)[1])
+
+    def resize(self, max_size, max_bytes=None):
+        """
+        Change the maximum number of cached grids.
+        :param max_size: new maximum, 0 disables caching
+        :param max_bytes: new maximum size in bytes, unchanged if not given
+        :return: None
+        """
+        self.max_size = max_size
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.evict()
+
+    def clear(self):
+        self.items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        :return: dict with hits, misses, current and maximum size
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self.items), 'max_size': self.max_size,
+                'bytes': self.nbytes(), 'max_bytes': self.max_bytes}
+
+
+def nbytes(value):
+    """
+    Get the memory used by a cached value.
+    :param value: array, tuple of values or object with an nbytes attribute
+    :return: size in bytes, 0 if unknown
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    return getattr(value, 'nbytes', 0)
+
+
+# shared by all ExactSolution instances unless they get their own cache
+default_cache = ExactCache()
+
+
+def read_only(*arrays):
+    for a in arrays:
+        a.flags.writeable = False
+    return arrays
 
 
 class ExactSolution:
+    def __init__(self, cache=None):
+        """
+        :param cache: ExactCache for computed grids, the shared default_cache
+        if not given
+        """
+        self.cache = default_cache if cache is None else cache
+
+    def __getstate__(self):
+        # the cache stays in the process which filled it
+        state = self.__dict__.copy()
+        if self.cache is default_cache:
+            del state['cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('cache', default_cache)
+
     def exact(self, x0, y0, X, n):
         """
         The function calculates points of exact solution of IVP of given
-        equation in the file equation. :param x0: initial point x0 :param y0:
-        initial point y0 :param X: the right side of an interval :param n:
-        number of steps :return: vx, vy - lists which contain points of the
-        graph
+        equation in the file equation. Results are cached, so the returned
+        arrays are read-only. :param x0: initial point x0 :param y0: initial
+        point y0 :param X: the right side of an interval :param n: number of
+        steps :return: vx, vy - arrays which contain points of the graph
+        """
+        return self.cache.get(('exact', x0, y0, X, n),
+                              lambda: self.compute_exact(x0, y0, X, n))
+
+    def compute_exact(self, x0, y0, X, n):
+        vx = self.grid(x0, X, n)
+        vy = self.general_solution(self.solve_ivp(x0, y0), vx)
+        vy[0] = y0
+        return vx, read_only(vy)[0]
+
+    def grid(self, x0, X, n):
+        """
+        Get the points of the grid of n steps. The read-only array is cached
+        and shared by all results on the grid.
+        :param x0: initial point x0
+        :param X: the right side of an interval
+        :param n: number of steps
+        :return: array of n + 1 points
         """
-        vx = [0] * (n + 1)
-        vy = [0] * (n + 1)
+        return self.cache.get(('grid', x0, X, n),
+                              lambda: self.compute_grid(x0, X, n))
+
+    def compute_grid(self, x0, X, n):
         h = (X - x0) / float(n)
+        vx = x0 + np.arange(n + 1) * h
         vx[0] = x0
-        vy[0] = y0
+        return read_only(vx)[0]
+
+    def trajectory(self, x0, y0, X, n):
+        """
+        Get the exact solution like exact as a Trajectory.
+        :param x0: initial point x0
+        :param y0: initial point y0
+        :param X: the right side of an interval
+        :param n: number of steps
+        :return: Trajectory on the shared grid
+        """
+        vx, vy = self.exact(x0, y0, X, n)
+        return Trajectory(vx, vy, 'Exact', (X - x0) / float(n), n, 0)
+
+    def iter_exact(self, x0, y0, X, n, chunk_size=None):
+        """
+        Calculate the exact solution lazily, chunk by chunk, so the memory
+        does not depend on n.
+        :param x0: initial point x0
+        :param y0: initial point y0
+        :param X: the right side of an interval
+        :param n: number of steps
+        :param chunk_size: if given, yield arrays of that many points
+        :return: generator of (x, y) pairs or of (vx, vy) arrays
+        """
+        if chunk_size is None:
+            return (point for vx, vy in self.iter_exact(x0, y0, X, n, 4096)
+                    for point in zip(vx.tolist(), vy.tolist()))
+        return self.iter_exact_chunks(x0, y0, X, n, chunk_size)
+
+    def iter_exact_chunks(self, x0, y0, X, n, chunk_size):
+        h = (X - x0) / float(n)
         c = self.solve_ivp(x0, y0)
-        for i in range(1, n + 1):
-            vx[i] = x = x0 + i * h
-            vy[i] = self.general_solution(c, x)
-        return vx, vy
+        for start in range(0, n + 1, chunk_size):
+            vx = x0 + np.arange(start, min(start + chunk_size, n + 1)) * h
+            vy = self.general_solution(c, vx)
+            if start == 0:
+                vx[0] = x0
+                vy[0] = y0
+            yield vx, vy
+
+    def sweep(self, x0, y0, X, ns):
+        """
+        Calculate exact solution on the grids of several numbers of steps.
+        Results are cached like in exact.
+        :param x0: initial point x0
+        :param y0: initial point y0
+        :param X: the right side of an interval
+        :param ns: increasing array of numbers of steps
+        :return: vy, offsets - values of all grids one after another and the
+        index where the grid of every n starts
+        """
+        return self.cache.get(('sweep', x0, y0, X, ns.tobytes()),
+                              lambda: self.compute_sweep(x0, y0, X, ns))
+
+    def compute_sweep(self, x0, y0, X, ns):
+        counts = ns + 1
+        offsets = np.cumsum(counts) - counts
+        steps = np.arange(counts.sum()) - np.repeat(offsets, counts)
+        h = (X - x0) / ns.astype(float)
+        vx = x0 + steps * np.repeat(h, counts)
+        vy = self.general_solution(self.solve_ivp(x0, y0), vx)
+        vy[offsets] = y0
+        return read_only(vy, offsets)
 
     def solve_ivp(self, x0, y0):
         """
@@ -30,15 +232,26 @@ class ExactSolution:
         :param y0: initial point y0
         :return: constant c
         """
-        c = min(math.sqrt(x0) - math.sqrt(y0 - x0),
-                math.sqrt(x0) + math.sqrt(y0 - x0))
+        c = np.minimum(np.sqrt(x0) - np.sqrt(y0 - x0),
+                       np.sqrt(x0) + np.sqrt(y0 - x0))
         return c
 
     def general_solution(self, c, x):
         """
         Calculate solution based on constant.
         :param c: constant for the equation
-        :param x: the x-coordinate for which you need to get y
+        :param x: the x-coordinate (number or numpy array) for which you need
+        to get y
         :return: y coordinate based on x coordinate and c
         """
-        return 2 * x - 2 * c * math.sqrt(x) + c * c
+        return 2 * x - 2 * c * np.sqrt(x) + c * c
+
+
+class UnknownSolution(ExactSolution):
+    """
+    Exact solution of an equation for which none is known, e.g. of a
+    system. Only the grid is available.
+    """
+
+    def solve_ivp(self, x0, y0):
+        raise ValueError("The exact solution of this equation is not known")
@@ -0,0 +1,240 @@
+# Usage Base of explicit Runge-Kutta methods. A method is defined only by
+# its Butcher tableau, the step function is generated from the coefficients:
+#   method = explicit.ExplicitSolution(tableau=explicit.RK38)
+#   vx, vy = method.get_graph(1, 10, 15, 100)
+# Euler, ImprovedEuler and RungeKutta are ExplicitSolution subclasses with
+# their tableaux.
+
+import math
+
+import numpy as np
+
+from equation import EQUATION, NumericalSolution
+
+# whole weights up to this are applied by repeated addition of the stage
+REPEAT_LIMIT = 4
+
+
+def terms(row):
+    """
+    Turn a row of coefficients into the sequence of additions of the step.
+    :param row: list of coefficients
+    :return: list of (coefficient, stage index), coefficient 1 means the
+    stage is added as is
+    """
+    result = []
+    for j, a in enumerate(row):
+        if a == int(a) and 0 < a <= REPEAT_LIMIT:
+            result += [(1, j)] * int(a)
+        elif a != 0:
+            result.append((a, j))
+    return result
+
+
+def compile_step(tableau):
+    """
+    Generate the function making one step of the method, with the
+    coefficients of the tableau written into the code. It evaluates the
+    stages with one expression each, as the hand-written methods would.
+    :param tableau: Tableau of the method
+    :return: function step(f, x0, y0, h) returning y at x0 + h
+    """
+    def total(stage_terms):
+        stages = ' + '.join('k%d' % j if a == 1 else '%r * k%d' % (a, j)
+                            for a, j in stage_terms)
+        if tableau.h_in_stages:
+            return '(%s)' % stages
+        return 'h * (%s)' % stages
+
+    lines = ['def step(f, x0, y0, h):']
+    for i, (c, stage_terms) in enumerate(zip(tableau.c,
+                                             tableau.stage_terms)):
+        x = 'x0' if c == 0 else 'x0 + h' if c == 1 else 'x0 + %r * h' % c
+        y = 'y0 + ' + total(stage_terms) if stage_terms else 'y0'
+        value = 'f(%s, %s)' % (x, y)
+        lines.append('    k%d = %s' % (i, 'h * ' + value
+                                       if tableau.h_in_stages else value))
+    dy = total(tableau.weight_terms)
+    if tableau.denominator != 1:
+        dy += ' / %r' % tableau.denominator
+    lines.append('    return y0 + ' + dy)
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['step']
+
+
+class Tableau:
+    """
+    Butcher tableau of an explicit Runge-Kutta method.
+    """
+
+    def __init__(self, name, order, c, a, b, denominator=1,
+                 h_in_stages=True):
+        """
+        :param name: name of the method
+        :param order: order of accuracy
+        :param c: nodes, c[0] is 0
+        :param a: rows of the coefficients of the previous stages, a[0] is
+        empty
+        :param b: weights, divided by denominator
+        :param denominator: common denominator of the weights
+        :param h_in_stages: the stages are h * f like in the classic
+        Runge-Kutta formulas, otherwise h multiplies sums of the stages.
+        Both give the same method and differ only in rounding
+        """
+        self.name = name
+        self.order = order
+        self.c = list(c)
+        self.a = [list(row) for row in a]
+        self.b = list(b)
+        self.denominator = denominator
+        self.h_in_stages = h_in_stages
+        # the additions of every stage and of the result, in the order of
+        # the coefficients
+        self.stage_terms = [terms(row) for row in self.a]
+        self.weight_terms = terms(self.b)
+        self.compiled = None
+
+    def __getstate__(self):
+        # the compiled step can not be pickled, it is rebuilt when needed
+        state = self.__dict__.copy()
+        state['compiled'] = None
+        return state
+
+    @property
+    def step(self):
+        # compiled on the first use, so importing the tableaux is cheap
+        if self.compiled is None:
+            self.compiled = compile_step(self)
+        return self.compiled
+
+    @property
+    def stages(self):
+        return len(self.c)
+
+    def __repr__(self):
+        return 'Tableau(%r, order=%d, stages=%d)' % (self.name, self.order,
+                                                    self.stages)
+
+
+EULER = Tableau('Euler', 1, [0], [[]], [1])
+# Heun's method, also known as the improved Euler method
+HEUN = Tableau('Heun', 2, [0, 1], [[], [1]], [1, 1], 2, h_in_stages=False)
+RALSTON = Tableau('Ralston', 2, [0, 2 / 3], [[], [2 / 3]], [1, 3], 4)
+RK3 = Tableau('RK3', 3, [0, 1 / 2, 1], [[], [1 / 2], [-1, 2]], [1, 4, 1], 6)
+RK4 = Tableau('RK4', 4, [0, 1 / 2, 1 / 2, 1],
+              [[], [1 / 2], [0, 1 / 2], [0, 0, 1]], [1, 2, 2, 1], 6)
+RK38 = Tableau('RK38', 4, [0, 1 / 3, 2 / 3, 1],
+               [[], [1 / 3], [-1 / 3, 1], [1, -1, 1]], [1, 3, 3, 1], 8)
+# Butcher's fifth order method
+RK5 = Tableau('RK5', 5, [0, 1 / 4, 1 / 4, 1 / 2, 3 / 4, 1],
+              [[], [1 / 4], [1 / 8, 1 / 8], [0, -1 / 2, 1],
+               [3 / 16, 0, 0, 9 / 16],
+               [-3 / 7, 2 / 7, 12 / 7, -12 / 7, 8 / 7]],
+              [7, 0, 32, 12, 32, 7], 90)
+# eighth order method of Cooper and Verner
+_S = math.sqrt(21)
+RK8 = Tableau('RK8', 8,
+              [0, 1 / 2, 1 / 2, (7 + _S) / 14, (7 + _S) / 14, 1 / 2,
+               (7 - _S) / 14, (7 - _S) / 14, 1 / 2, (7 + _S) / 14, 1],
+              [[],
+               [1 / 2],
+               [1 / 4, 1 / 4],
+               [1 / 7, (-7 - 3 * _S) / 98, (21 + 5 * _S) / 49],
+               [(11 + _S) / 84, 0, (18 + 4 * _S) / 63, (21 - _S) / 252],
+               [(5 + _S) / 48, 0, (9 + _S) / 36, (-231 + 14 * _S) / 360,
+                (63 - 7 * _S) / 80],
+               [(10 - _S) / 42, 0, (-432 + 92 * _S) / 315,
+                (633 - 145 * _S) / 90, (-504 + 115 * _S) / 70,
+                (63 - 13 * _S) / 35],
+               [1 / 14, 0, 0, 0, (14 - 3 * _S) / 126, (13 - 3 * _S) / 63,
+                1 / 9],
+               [1 / 32, 0, 0, 0, (91 - 21 * _S) / 576, 11 / 72,
+                (-385 - 75 * _S) / 1152, (63 + 13 * _S) / 128],
+               [1 / 14, 0, 0, 0, 1 / 9, (-733 - 147 * _S) / 2205,
+                (515 + 111 * _S) / 504, (-51 - 11 * _S) / 56,
+                (132 + 28 * _S) / 245],
+               [0, 0, 0, 0, (-42 + 7 * _S) / 18, (-18 + 28 * _S) / 45,
+                (-273 - 53 * _S) / 72, (301 + 53 * _S) / 72,
+                (28 - 28 * _S) / 45, (49 - 7 * _S) / 18]],
+              [9, 0, 0, 0, 0, 0, 0, 49, 64, 49, 9], 180)
+
+TABLEAUX = {t.name: t for t in (EULER, HEUN, RALSTON, RK3, RK4, RK38, RK5,
+                                RK8)}
+
+
+class ExplicitSolution(NumericalSolution):
+    tableau = RK4
+    order = 4
+    evaluations = 4
+
+    def __init__(self, equation=EQUATION, tableau=None):
+        """
+        :param equation: right side f(x, y) of ODE
+        :param tableau: Tableau of the method, the tableau of the class if
+        not given
+        """
+        super().__init__(equation)
+        if tableau is not None:
+            self.tableau = tableau
+            self.order = tableau.order
+            self.evaluations = tableau.stages
+
+    @property
+    def name(self):
+        if 'tableau' in self.__dict__:
+            return self.tableau.name
+        return type(self).__name__
+
+    def identity(self):
+        identity = super().identity()
+        identity.update(tableau=self.tableau.name)
+        return identity
+
+    def find_next(self, x0, y0, h):
+        # the compiled step is read directly, the property costs as much as
+        # the step of Euler's method
+        step = self.tableau.compiled or self.tableau.step
+        return step(self.f, x0, y0, h)
+
+    def find_next_into(self, x0, y0, h, out):
+        t = self.tableau
+        buffers = self.stage_buffers(y0.shape, t.stages + 2)
+        k, total, term = buffers[:-2], buffers[-2], buffers[-1]
+        for i, (c, stage_terms) in enumerate(zip(t.c, t.stage_terms)):
+            x = x0 if c == 0 else x0 + c * h
+            y = y0
+            if stage_terms:
+                self.combine_into(stage_terms, k, h, total, term)
+                total += y0
+                y = total
+            if t.h_in_stages:
+                np.multiply(h, self.f(x, y), out=k[i])
+            else:
+                k[i][...] = self.f(x, y)
+        self.combine_into(t.weight_terms, k, h, total, term)
+        if t.denominator != 1:
+            total /= t.denominator
+        np.add(y0, total, out=out)
+
+    def combine_into(self, stage_terms, k, h, out, term):
+        """
+        Sum the stages with coefficients like combine, into a buffer.
+        :param stage_terms: list of (coefficient, stage index)
+        :param k: list of stages
+        :param h: step size
+        :param out: array for the sum
+        :param term: work array of the same shape
+        :return: None
+        """
+        for n, (a, j) in enumerate(stage_terms):
+            if a == 1:
+                value = k[j]
+            else:
+                value = np.multiply(a, k[j], out=term)
+            if n == 0:
+                out[...] = value
+            else:
+                out += value
+        if not self.tableau.h_in_stages:
+            out *= h
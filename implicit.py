@@ -0,0 +1,148 @@
+# Usage Base of implicit methods. Every step solves the equation
+# y1 = a + c * f(x1, y1) with Newton iterations, which allows big steps on
+# stiff equations. The Jacobian df/dy is reused across steps until Newton
+# iterations stop converging fast enough.
+
+import numpy as np
+
+import rhs
+from equation import EQUATION, NumericalSolution
+
+
+def tail(array, shape):
+    """
+    Get the part of a cached batch array matching the current batch. Batches
+    only drop trajectories from the front between consecutive steps.
+    :param array: cached array
+    :param shape: shape of the current batch
+    :return: last items of array or None if they do not match
+    """
+    if array is None or np.ndim(array) != len(shape):
+        return None
+    if len(shape) == 0:
+        return array
+    if len(array) < shape[0]:
+        return None
+    return array[len(array) - shape[0]:]
+
+
+class ImplicitSolution(NumericalSolution):
+
+    def __init__(self, equation=EQUATION, jacobian=None, tol=1e-10,
+                 max_iter=10):
+        """
+        :param equation: right side f(x, y) of ODE
+        :param jacobian: df/dy as an expression or a function of x and y,
+        a matrix for systems, estimated with finite differences if not given
+        :param tol: relative tolerance of Newton iterations
+        :param max_iter: maximum number of Newton iterations per attempt
+        """
+        super().__init__(equation)
+        self.jacobian = jacobian
+        self.df = None if jacobian is None else rhs.compile_rhs(jacobian)
+        self.tol = tol
+        self.max_iter = max_iter
+        self.jacobian_evals = 0
+        self.newton_iters = 0
+        self.reset()
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if self.jacobian is not None:
+            self.df = rhs.compile_rhs(self.jacobian)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['df'] = None
+        return state
+
+    def identity(self):
+        identity = super().identity()
+        identity.update(tol=self.tol, max_iter=self.max_iter,
+                        jacobian=None if self.jacobian is None
+                        else rhs.identity(self.jacobian))
+        return identity
+
+    def reset(self):
+        """
+        Forget the cached Jacobian and the previous steps.
+        :return: None
+        """
+        self.jac = None
+        self.jac_system = None
+        self.inverse = None
+
+    def jacobian_at(self, x, y, system):
+        """
+        Calculate df/dy elementwise, or as a matrix for systems.
+        :param x: x-coordinate
+        :param y: y (number, batch of independent values or vector)
+        :param system: y is a vector of a system
+        :return: df/dy
+        """
+        self.jacobian_evals += 1
+        if self.df is not None:
+            if system:
+                return np.asarray(self.df(x, y), dtype=float)
+            return np.broadcast_to(self.df(x, y), np.shape(y)).astype(float)
+        f = np.asarray(self.f(x, y), dtype=float)
+        eps = 1.5e-8 * np.maximum(1, np.abs(y))
+        if not system:
+            return (self.f(x, y + eps) - f) / eps
+        jac = np.empty((len(y), len(y)))
+        for j in range(len(y)):
+            shifted = np.array(y, dtype=float)
+            shifted[j] += eps[j]
+            jac[:, j] = (self.f(x, shifted) - f) / eps[j]
+        return jac
+
+    def newton(self, x1, a, c, guess, system=False):
+        """
+        Solve y = a + c * f(x1, y).
+        :param x1: x at the end of the step
+        :param a: explicit part of the method
+        :param c: step size times the implicit weight
+        :param guess: initial approximation of y
+        :param system: y is a vector of a system
+        :return: y at x1
+        """
+        shape = np.shape(guess)
+        for attempt in range(2):
+            if system:
+                if self.jac_system is None or \
+                        self.jac_system.shape != (len(guess), len(guess)):
+                    self.jac_system = self.jacobian_at(x1, guess, True)
+                    self.inverse = None
+                if self.inverse is None or self.inverse[0] != c:
+                    matrix = np.eye(len(guess)) - c * self.jac_system
+                    self.inverse = (c, np.linalg.inv(matrix))
+            else:
+                jac = tail(self.jac, shape)
+                if jac is None:
+                    jac = self.jac = self.jacobian_at(x1, guess, False)
+                derivative = 1 - c * jac
+
+            y = guess
+            previous = np.inf
+            for k in range(self.max_iter):
+                self.newton_iters += 1
+                residual = y - a - c * self.f(x1, y)
+                if system:
+                    delta = -np.dot(self.inverse[1], residual)
+                else:
+                    delta = -residual / derivative
+                y = y + delta
+                norm = np.max(np.abs(delta) / (1 + np.abs(y)))
+                if norm <= self.tol:
+                    return y
+                if not np.isfinite(norm) or (attempt == 0 and
+                                             norm > 0.5 * previous):
+                    break  # convergence degraded, update the Jacobian
+                previous = norm
+            if attempt == 0:
+                self.jac = None
+                self.jac_system = None
+                if np.all(np.isfinite(y)):
+                    guess = y
+        raise ValueError("Newton iterations did not converge at x = %s"
+                         % np.max(x1))
@@ -1,13 +1,11 @@
 # Usage Get the approximate solution of ODE using Improved Euler's method and
 # corresponding errors compare to exact solution
 
-from equation import NumericalSolution
+from explicit import HEUN, ExplicitSolution
 
 
-class ImprovedEuler(NumericalSolution):
+class ImprovedEuler(ExplicitSolution):
 
-    def find_next(self, x0, y0, h):
-        m1 = self.f(x0, y0)
-        x0 += h
-        m2 = self.f(x0, y0 + h * m1)
-        return y0 + h * (m1 + m2) / 2
+    order = 2
+    evaluations = 2
+    tableau = HEUN
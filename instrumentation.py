@@ -0,0 +1,220 @@
+# USAGE
+# Count evaluations of the right side, steps and time spent in every phase
+# of a method:
+#   stats = instrumentation.Stats()
+#   instrumentation.instrument(method, stats)
+#   method.total_error(1, 10, 15)
+#   print(stats.report())
+# Methods which are not instrumented run without any overhead. Profile a
+# piece of code with cProfile or pyinstrument:
+#   with instrumentation.profiled('cprofile'):
+#       method.get_graph(1, 10, 15, 10 ** 5)
+
+import contextlib
+import time
+
+import numpy as np
+
+# methods of NumericalSolution which are timed as phases
+PHASES = ('get_graph', 'get_graph_at', 'get_graph_batch', 'get_graph_system',
+          'solve', 'analyze', 'local_error', 'total_error', 'richardson',
+          'solve_to_tolerance')
+
+
+class MethodStats:
+    def __init__(self):
+        self.f_calls = 0
+        self.f_points = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.phases = {}
+        # number of results loaded from a store instead of computed
+        self.loaded = 0
+
+    def as_dict(self):
+        return {'f_calls': self.f_calls, 'f_points': self.f_points,
+                'accepted': self.accepted, 'rejected': self.rejected,
+                'phases': {name: {'calls': calls, 'seconds': seconds}
+                           for name, (calls, seconds) in self.phases.items()},
+                'loaded': self.loaded}
+
+    def cost(self, phase):
+        """
+        Get the counters as an array, the cost of a computation is the
+        difference of the arrays after and before it.
+        :param phase: name of the phase whose calls and time are included
+        :return: array of f calls, f points, accepted and rejected steps,
+        calls and seconds of the phase
+        """
+        calls, seconds = self.phases.get(phase, (0, 0.0))
+        return np.array([self.f_calls, self.f_points, self.accepted,
+                         self.rejected, calls, seconds], dtype=float)
+
+    def add_cost(self, phase, cost):
+        """
+        Add the cost of a computation which was not run, e.g. of a result
+        loaded from a store.
+        :param phase: name of the phase
+        :param cost: difference of two arrays returned by cost
+        :return: None
+        """
+        f_calls, f_points, accepted, rejected, calls, seconds = \
+            np.asarray(cost).tolist()
+        self.f_calls += int(f_calls)
+        self.f_points += int(f_points)
+        self.accepted += int(accepted)
+        self.rejected += int(rejected)
+        old_calls, old_seconds = self.phases.get(phase, (0, 0.0))
+        self.phases[phase] = (old_calls + int(calls), old_seconds + seconds)
+
+
+class Stats:
+    def __init__(self):
+        self.methods = {}
+
+    def method(self, name):
+        """
+        :param name: name of the method
+        :return: MethodStats of the method
+        """
+        return self.methods.setdefault(name, MethodStats())
+
+    def as_dict(self):
+        return {name: stats.as_dict() for name, stats in self.methods.items()}
+
+    def report(self):
+        """
+        :return: text table with the statistics of every method
+        """
+        lines = []
+        for name, stats in sorted(self.methods.items()):
+            lines.append("%s: %d f calls (%d points), %d accepted and %d "
+                         "rejected steps" % (name, stats.f_calls,
+                                             stats.f_points, stats.accepted,
+                                             stats.rejected))
+            for phase, (calls, seconds) in sorted(stats.phases.items()):
+                lines.append("    %s: %d calls, %.6f s" % (phase, calls,
+                                                          seconds))
+        return '\n'.join(lines)
+
+
+def instrument(solver, stats, name=None):
+    """
+    Replace the right side, the step and the phases of a method by wrappers
+    which record statistics. Call uninstrument before pickling the method.
+    :param solver: NumericalSolution instance
+    :param stats: Stats collecting the results
+    :param name: name of the method in stats, the class name if not given
+    :return: None
+    """
+    if 'instrumented' in solver.__dict__:
+        uninstrument(solver)
+    record = stats.method(name or type(solver).__name__)
+    originals = {'f': solver.__dict__.get('f')}
+
+    def f(x, y):
+        record.f_calls += 1
+        record.f_points += np.size(y)
+        return originals['f'](x, y)
+
+    inside = [False]
+
+    def step(attr):
+        original = getattr(solver, attr)
+
+        def counted(*args):
+            if inside[0]:
+                # find_next_into may be implemented through find_next
+                return original(*args)
+            # find_next steps every IVP of a batch, find_next_into steps the
+            # single state of a system
+            record.accepted += np.size(args[1]) if attr == 'find_next' else 1
+            inside[0] = True
+            try:
+                return original(*args)
+            finally:
+                inside[0] = False
+        return counted
+
+    def phase(attr):
+        original = getattr(solver, attr)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                calls, seconds = record.phases.get(attr, (0, 0.0))
+                record.phases[attr] = (calls + 1,
+                                       seconds + time.perf_counter() - start)
+                if attr == 'solve':
+                    record.accepted += solver.accepted
+                    record.rejected += solver.rejected
+        return timed
+
+    solver.f = f
+    for attr in ('find_next', 'find_next_into'):
+        originals[attr] = solver.__dict__.get(attr)
+        setattr(solver, attr, step(attr))
+    for attr in PHASES:
+        if hasattr(solver, attr):
+            originals[attr] = solver.__dict__.get(attr)
+            setattr(solver, attr, phase(attr))
+    solver.instrumented = originals
+
+
+def uninstrument(solver):
+    """
+    Remove the wrappers installed by instrument.
+    :param solver: NumericalSolution instance
+    :return: None
+    """
+    originals = solver.__dict__.pop('instrumented', None)
+    if originals is None:
+        return
+    for attr, original in originals.items():
+        if original is None:
+            delattr(solver, attr)
+        else:
+            setattr(solver, attr, original)
+
+
+@contextlib.contextmanager
+def profiled(kind='cprofile', output=None):
+    """
+    Profile the code inside the with block.
+    :param kind: 'cprofile' or 'pyinstrument'
+    :param output: file for the results, printed if not given
+    :return: context manager yielding the profiler
+    """
+    if kind == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+            else:
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    elif kind == 'pyinstrument':
+        try:
+            import pyinstrument
+        except ImportError:
+            raise ValueError("pyinstrument is not installed")
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            if output:
+                with open(output, 'w') as f:
+                    f.write(profiler.output_html())
+            else:
+                print(profiler.output_text())
+    else:
+        raise ValueError("Unknown profiler %r" % kind)
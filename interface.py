@@ -1,13 +1,21 @@
 # USAGE
-# Run interface.py to operate with gui
+# Run interface.py or "python cli.py gui" to operate with gui. This is the
+# only module which needs tkinter and matplotlib, the numerical methods can
+# be imported without them.
 
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import *
 from tkinter import messagebox
 
+import numpy as np
+
+import analysis
+import decimation
 import rungekutta
 import euler
 import improved_euler
 import exact_solution
+import store
 from matplotlib.backends.backend_tkagg import (
     FigureCanvasTkAgg, NavigationToolbar2Tk)
 from matplotlib.backend_bases import key_press_handler
@@ -18,6 +26,9 @@ import matplotlib as mpl
 """Combination of matplotlib and tkinter to display the numerical methods for 
 solving ODEs. """
 
+# delay in milliseconds between the last move of the n slider and the update
+DEBOUNCE_DELAY = 150
+
 
 class App:
     def onpick(self, event):
@@ -45,7 +56,45 @@ class App:
             legline.set_alpha(1.0)
         else:
             legline.set_alpha(0.2)
-        self.canvas.draw()
+        axes = origline.axes
+        if axes not in self.backgrounds:
+            self.canvas.draw_idle()
+            return
+        # redraw only the lines and the legend of the picked axes on top of
+        # its cached background (blitting)
+        self.canvas.restore_region(self.backgrounds[axes])
+        for artist in self.animated_artists(axes):
+            axes.draw_artist(artist)
+        self.canvas.blit(axes.bbox)
+
+    def animated_artists(self, axes):
+        """
+        Get the artists of the axes which are left out of full draws and
+        drawn on top of the cached background.
+        :param axes: axes of the figure
+        :return: list of the lines and the legend
+        """
+        artists = list(axes.get_lines())
+        if axes.get_legend() is not None:
+            artists.append(axes.get_legend())
+        return artists
+
+    def on_draw(self, event):
+        """
+        Cache the background of every axes after a full draw, then draw the
+        animated lines and legends on top of it.
+
+        :param event: draw event of the figure
+        :return: None
+        """
+        if self.canvas.is_saving():
+            # saving draws the animated artists with the others
+            return
+        self.backgrounds = {axes: self.canvas.copy_from_bbox(axes.bbox)
+                            for axes in self.sol_fig.axes}
+        for axes in self.sol_fig.axes:
+            for artist in self.animated_artists(axes):
+                artist.draw(event.renderer)
 
     def on_key_press(self, event):
         """
@@ -109,7 +158,7 @@ class App:
 
         self.n_change = Scale(master=f_top, from_=self.n, to=200,
                               orient=HORIZONTAL, bg=self.my_color,
-                              font=self.my_font)
+                              font=self.my_font, command=self.on_n_change)
         self.n_change.pack(side=LEFT)
 
         x0_text = StringVar()
@@ -186,6 +235,18 @@ class App:
                         bg=self.my_color, font=self.my_font)
         button.pack(side=LEFT)
 
+        self.progress = StringVar()
+        progress_label = Label(master=root, textvariable=self.progress,
+                               bg=self.my_color, font=self.my_font)
+        progress_label.pack(side=LEFT)
+
+        self.stats = StringVar()
+        self.stats.set(self.initial_stats)
+        stats_label = Label(master=root, textvariable=self.stats,
+                            bg=self.my_color, font=self.my_font,
+                            justify=LEFT)
+        stats_label.pack(side=LEFT)
+
     def __init__(self, root):
         """
         Initialize graphs of the equations, graphs of the local errors.
@@ -209,32 +270,36 @@ class App:
         self.improved_euler = improved_euler.ImprovedEuler()
         self.exact_solution = exact_solution.ExactSolution()
 
-        vx_rk, vy_rk = self.runge_kutta.get_graph(self.x0, self.y0, self.X,
-                                                  self.n)
-        vx_eu, vy_eu = self.euler.get_graph(self.x0, self.y0, self.X, self.n)
-        vx_ieu, vy_ieu = self.improved_euler.get_graph(self.x0, self.y0, self.X,
-                                                       self.n)
-        vx_ex, vy_ex = self.exact_solution.exact(self.x0, self.y0, self.X,
-                                                 self.n)
-
-        # initialize local error graphs
-        vx_er_eu, vy_er_eu = self.euler.local_error(self.x0, self.y0, self.X,
-                                                    self.n)
-        vx_er_rk, vy_er_rk = self.runge_kutta.local_error(self.x0, self.y0,
-                                                          self.X, self.n)
-        vx_er_ieu, vy_er_ieu = self.improved_euler.local_error(self.x0, self.y0,
-                                                               self.X, self.n)
-
-        vx_ger_rk, vy_ger_rk = self.runge_kutta.total_error(self.x0, self.y0,
-                                                            self.X, self.min_n,
-                                                            self.max_n)
-        vx_ger_eu, vy_ger_eu = self.euler.total_error(self.x0, self.y0, self.X,
-                                                      self.min_n, self.max_n)
-        vx_ger_ieu, vy_ger_ieu = self.improved_euler.total_error(self.x0,
-                                                                 self.y0,
-                                                                 self.X,
-                                                                 self.min_n,
-                                                                 self.max_n)
+        self.methods = [self.runge_kutta, self.euler, self.improved_euler]
+        self.method_names = ['Runge-Kutta', 'Euler', 'Improved Euler']
+
+        # results of earlier runs are loaded from disk
+        self.store = store.ResultStore()
+
+        # recomputations run in worker processes, one job per method
+        self.pool = ProcessPoolExecutor(max_workers=len(self.methods))
+        self.jobs = []
+        self.generation = 0
+
+        vx, vy_ex, results = analysis.analyze(self.methods, self.x0, self.y0,
+                                              self.X, self.n, self.min_n,
+                                              self.max_n, instrumented=True,
+                                              store=self.store)
+        self.initial_stats = self.format_stats(results)
+
+        # parameters of the shown graphs and every computed total error, so
+        # an update recomputes only what its changed parameters affect
+        self.pending_update = None
+        self.shown_ivp = self.sweep_ivp = (self.x0, self.y0, self.X)
+        self.shown_n = self.n
+        self.shown_vx = vx
+        self.shown_vy_ex = vy_ex
+        self.solutions = [result[:2] for result in results]
+        self.sweeps = [dict(zip(result[2].tolist(), result[3].tolist()))
+                       for result in results]
+        (vy_rk, vy_er_rk, vx_ger, vy_ger_rk, _), \
+            (vy_eu, vy_er_eu, _, vy_ger_eu, _), \
+            (vy_ieu, vy_er_ieu, _, vy_ger_ieu, _) = results
 
         # create plots
         self.sol_fig = Figure(figsize=(6, 4), dpi=90)
@@ -249,30 +314,30 @@ class App:
         total_error_subplot.set_ylabel('Total Approximation Error')
         total_error_subplot.set_xlabel('n')
 
-        self.graph_rk, = sol_subplot.plot(vx_rk, vy_rk, label='Runge-Kutta')
-        self.graph_eu, = sol_subplot.plot(vx_eu, vy_eu, label='Euler')
-        self.graph_ieu, = sol_subplot.plot(vx_ieu, vy_ieu,
+        self.graph_rk, = sol_subplot.plot(vx, vy_rk, label='Runge-Kutta')
+        self.graph_eu, = sol_subplot.plot(vx, vy_eu, label='Euler')
+        self.graph_ieu, = sol_subplot.plot(vx, vy_ieu,
                                            label='Improved Euler')
-        self.graph_ex, = sol_subplot.plot(vx_ex, vy_ex, label='Exact Solution')
+        self.graph_ex, = sol_subplot.plot(vx, vy_ex, label='Exact Solution')
         sol_subplot.set_title("Solution")
         self.leg_sol = sol_subplot.legend(loc='upper left', fancybox=True,
                                           shadow=True)
 
-        self.graph_er_rk, = local_error_subplot.plot(vx_er_rk, vy_er_rk,
+        self.graph_er_rk, = local_error_subplot.plot(vx, vy_er_rk,
                                                      label='Runge-Kutta')
-        self.graph_er_eu, = local_error_subplot.plot(vx_er_eu, vy_er_eu,
+        self.graph_er_eu, = local_error_subplot.plot(vx, vy_er_eu,
                                                      label='Euler')
-        self.graph_er_ieu, = local_error_subplot.plot(vx_er_ieu, vy_er_ieu,
+        self.graph_er_ieu, = local_error_subplot.plot(vx, vy_er_ieu,
                                                       label='Improved Euler')
         local_error_subplot.set_title("Local Error")
         self.leg_er = local_error_subplot.legend(loc='upper left',
                                                  fancybox=True, shadow=True)
 
-        self.graph_ger_rk, = total_error_subplot.plot(vx_ger_rk, vy_ger_rk,
+        self.graph_ger_rk, = total_error_subplot.plot(vx_ger, vy_ger_rk,
                                                       label='Runge-Kutta')
-        self.graph_ger_eu, = total_error_subplot.plot(vx_ger_eu, vy_ger_eu,
+        self.graph_ger_eu, = total_error_subplot.plot(vx_ger, vy_ger_eu,
                                                       label='Euler')
-        self.graph_ger_ieu, = total_error_subplot.plot(vx_ger_ieu, vy_ger_ieu,
+        self.graph_ger_ieu, = total_error_subplot.plot(vx_ger, vy_ger_ieu,
                                                        label='Improved Euler')
         total_error_subplot.set_title("Total Error")
         self.leg_ger = total_error_subplot.legend(loc='upper left',
@@ -281,6 +346,21 @@ class App:
         # fix scale corresponding to IVP
         self.fix_scale(vy_ex, vy_er_eu, vy_ger_eu)
 
+        # keep all points and plot only what fits into the pixels of the axes
+        self.curves = dict()
+        for graph, vx_graph, vy_graph in [
+                (self.graph_rk, vx, vy_rk), (self.graph_eu, vx, vy_eu),
+                (self.graph_ieu, vx, vy_ieu), (self.graph_ex, vx, vy_ex),
+                (self.graph_er_rk, vx, vy_er_rk),
+                (self.graph_er_eu, vx, vy_er_eu),
+                (self.graph_er_ieu, vx, vy_er_ieu),
+                (self.graph_ger_rk, vx_ger, vy_ger_rk),
+                (self.graph_ger_eu, vx_ger, vy_ger_eu),
+                (self.graph_ger_ieu, vx_ger, vy_ger_ieu)]:
+            self.set_graph(graph, vx_graph, vy_graph)
+        for axes in self.sol_fig.axes:
+            axes.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
         # manage graph picking for solutions
         self.graphs_sol = [self.graph_rk, self.graph_eu, self.graph_ieu,
                            self.graph_ex]
@@ -304,9 +384,17 @@ class App:
             legline.set_picker(5)  # 5 pts tolerance
             self.lined_ger[legline] = origline
 
+        # the lines and the legends are drawn over the cached backgrounds of
+        # the axes, so toggling a line does not redraw the whole figure
+        for axes in self.sol_fig.axes:
+            for artist in self.animated_artists(axes):
+                artist.set_animated(True)
+        self.backgrounds = dict()
+
         # put everything on canvas
         self.canvas = FigureCanvasTkAgg(self.sol_fig,
                                         master=root)  # A tk.DrawingArea.
+        self.canvas.mpl_connect('draw_event', self.on_draw)
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(side=TOP, fill=BOTH, expand=1)
 
@@ -316,6 +404,7 @@ class App:
 
         self.canvas.mpl_connect("key_press_event", self.on_key_press)
         self.canvas.mpl_connect('pick_event', self.onpick)
+        self.canvas.mpl_connect('resize_event', self.on_resize)
 
         self.initialize_ui_elements()
         mainloop()
@@ -325,6 +414,7 @@ class App:
         The function is responsible for updating plots with the change of IVP.
         :return: None
         """
+        self.pending_update = None
         # get initial values from user
         n = self.n_change.get()
         x0 = self.x0_entry.get()
@@ -377,79 +467,200 @@ class App:
             self.show_message(
                 "The min n value is larger or equal to the max n value")
 
-        # build graph of solution with new IVP
-        vx_rk, vy_rk = self.runge_kutta.get_graph(self.x0, self.y0, self.X, n)
-        vx_eu, vy_eu = self.euler.get_graph(self.x0, self.y0, self.X, n)
-        vx_ieu, vy_ieu = self.improved_euler.get_graph(self.x0, self.y0, self.X,
-                                                       n)
-        vx_ex, vy_ex = self.exact_solution.exact(self.x0, self.y0, self.X, n)
-
-        # build graph of local error with new IVP
-        vx_er_eu, vy_er_eu = self.euler.local_error(self.x0, self.y0, self.X, n)
-        vx_er_rk, vy_er_rk = self.runge_kutta.local_error(self.x0, self.y0,
-                                                          self.X, n)
-        vx_er_ieu, vy_er_ieu = self.improved_euler.local_error(self.x0, self.y0,
-                                                               self.X, n)
-
-        vx_ger_rk, vy_ger_rk = self.runge_kutta.total_error(self.x0, self.y0,
-                                                            self.X, self.min_n,
-                                                            self.max_n)
-        vx_ger_eu, vy_ger_eu = self.euler.total_error(self.x0, self.y0, self.X,
-                                                      self.min_n, self.max_n)
-        vx_ger_ieu, vy_ger_ieu = self.improved_euler.total_error(self.x0,
-                                                                 self.y0,
-                                                                 self.X,
-                                                                 self.min_n,
-                                                                 self.max_n)
-
-        self.fix_scale(vy_ex, vy_er_eu, vy_ger_eu)
-
-        # update graphs
-        self.graph_rk.set_xdata(vx_rk)
-        self.graph_rk.set_ydata(vy_rk)
+        # drop the jobs of the previous update which did not start yet
+        for job in self.jobs:
+            job.cancel()
+        self.generation += 1
+
+        # recompute in the background only what the changed parameters
+        # affect, total errors computed before for this IVP are reused
+        ivp = (self.x0, self.y0, self.X)
+        solve = ivp != self.shown_ivp or n != self.shown_n
+        if solve:
+            vx, vy_ex = self.exact_solution.exact(self.x0, self.y0, self.X, n)
+        else:
+            vx, vy_ex = self.shown_vx, self.shown_vy_ex
+        known = self.sweeps[0] if ivp == self.sweep_ivp else {}
+        ns = np.array([k for k in range(self.min_n, self.max_n)
+                       if k not in known], dtype=int)
+        self.jobs = [self.pool.submit(analysis.analyze_method, method,
+                                      self.x0, self.y0, self.X,
+                                      n if solve else None, self.min_n,
+                                      self.max_n, vy_ex, True, ns,
+                                      self.store)
+                     for method in self.methods]
+        self.poll(self.generation, n, vx, vy_ex)
+
+    def on_n_change(self, value):
+        """
+        Update the graphs when the n slider stops moving.
+        :param value: new value of the slider
+        :return: None
+        """
+        if self.pending_update is not None:
+            root.after_cancel(self.pending_update)
+        self.pending_update = root.after(DEBOUNCE_DELAY, self.update)
 
-        self.graph_eu.set_xdata(vx_eu)
-        self.graph_eu.set_ydata(vy_eu)
+    def poll(self, generation, n, vx, vy_ex):
+        """
+        Check the background jobs and show their results once all of them
+        are finished.
+        :param generation: number of the update which submitted the jobs
+        :param n: number of steps of the solutions
+        :param vx: x coordinates of the solution grid
+        :param vy_ex: y coordinates of exact solution
+        :return: None
+        """
+        if generation != self.generation:
+            return  # a newer update replaced these jobs
+        done = sum(job.done() for job in self.jobs)
+        if done < len(self.jobs):
+            self.progress.set("Computing %d/%d" % (done, len(self.jobs)))
+            root.after(50, self.poll, generation, n, vx, vy_ex)
+            return
+        self.progress.set("")
+        try:
+            results = [job.result() for job in self.jobs]
+        except Exception as e:
+            self.show_message("Computation failed: %s" % e)
+            return
+
+        ivp = (self.x0, self.y0, self.X)
+        if results[0][0] is not None:
+            self.solutions = [result[:2] for result in results]
+            self.shown_vx = vx
+            self.shown_vy_ex = vy_ex
+        self.shown_ivp = ivp
+        self.shown_n = n
+        if ivp != self.sweep_ivp:
+            self.sweep_ivp = ivp
+            self.sweeps = [dict() for _ in self.methods]
+        vx_ger = np.arange(self.min_n, self.max_n)
+        merged = []
+        for solution, sweep, result in zip(self.solutions, self.sweeps,
+                                           results):
+            sweep.update(zip(result[2].tolist(), result[3].tolist()))
+            vy_ger = np.array([sweep[k] for k in vx_ger.tolist()])
+            merged.append(solution + (vx_ger, vy_ger, result[4]))
+        self.stats.set(self.format_stats(merged))
+        self.show_results(self.shown_vx, self.shown_vy_ex, merged)
+
+    def format_stats(self, results):
+        """
+        Describe the cost and the accuracy of every method.
+        :param results: tuples returned by analysis.analyze_method
+        :return: text for the stats panel
+        """
+        lines = []
+        for name, result in zip(self.method_names, results):
+            stats = result[4]
+            seconds = sum(phase['seconds']
+                          for phase in stats['phases'].values())
+            lines.append("%s: %d f evaluations, %.3f s, best total error "
+                         "%.2e%s" % (name, stats['f_points'], seconds,
+                                     min(result[3], default=0),
+                                     " (cost of the stored results)"
+                                     if stats['loaded'] else ""))
+        return '\n'.join(lines)
+
+    def show_results(self, vx, vy_ex, results):
+        """
+        Put computed solutions and errors on the graphs.
+        :param vx: x coordinates of the solution grid
+        :param vy_ex: y coordinates of exact solution
+        :param results: tuples (vy, vy_er, vx_ger, vy_ger, stats) for
+        Runge-Kutta, Euler and Improved Euler
+        :return: None
+        """
+        (vy_rk, vy_er_rk, vx_ger, vy_ger_rk, _), \
+            (vy_eu, vy_er_eu, _, vy_ger_eu, _), \
+            (vy_ieu, vy_er_ieu, _, vy_ger_ieu, _) = results
 
-        self.graph_ieu.set_xdata(vx_ieu)
-        self.graph_ieu.set_ydata(vy_ieu)
+        # update graphs, the limits are fixed afterwards so the curves are
+        # decimated for the new visible interval
+        self.set_graph(self.graph_rk, vx, vy_rk)
+        self.set_graph(self.graph_eu, vx, vy_eu)
+        self.set_graph(self.graph_ieu, vx, vy_ieu)
+        self.set_graph(self.graph_ex, vx, vy_ex)
 
-        self.graph_ex.set_xdata(vx_ex)
-        self.graph_ex.set_ydata(vy_ex)
+        self.set_graph(self.graph_er_eu, vx, vy_er_eu)
+        self.set_graph(self.graph_er_rk, vx, vy_er_rk)
+        self.set_graph(self.graph_er_ieu, vx, vy_er_ieu)
 
-        self.graph_er_eu.set_xdata(vx_er_eu)
-        self.graph_er_eu.set_ydata(vy_er_eu)
+        self.set_graph(self.graph_ger_rk, vx_ger, vy_ger_rk)
+        self.set_graph(self.graph_ger_eu, vx_ger, vy_ger_eu)
+        self.set_graph(self.graph_ger_ieu, vx_ger, vy_ger_ieu)
 
-        self.graph_er_rk.set_xdata(vx_er_rk)
-        self.graph_er_rk.set_ydata(vy_er_rk)
+        self.fix_scale(vy_ex, vy_er_eu, vy_ger_eu)
 
-        self.graph_er_ieu.set_xdata(vx_er_ieu)
-        self.graph_er_ieu.set_ydata(vy_er_ieu)
+        self.canvas.draw_idle()
 
-        self.graph_ger_rk.set_xdata(vx_ger_rk)
-        self.graph_ger_rk.set_ydata(vy_ger_rk)
+    def set_graph(self, graph, vx, vy):
+        """
+        Remember all points of a curve and show only as many of them as the
+        axes can display.
+        :param graph: line of the curve
+        :param vx: x coordinates
+        :param vy: y coordinates
+        :return: None
+        """
+        self.curves[graph] = (vx, vy)
+        self.decimate_graph(graph)
 
-        self.graph_ger_eu.set_xdata(vx_ger_eu)
-        self.graph_ger_eu.set_ydata(vy_ger_eu)
+    def decimate_graph(self, graph):
+        """
+        Put the decimated curve for the visible interval on the line.
+        :param graph: line of the curve
+        :return: None
+        """
+        xmin, xmax = graph.axes.get_xlim()
+        graph.set_data(*decimation.minmax_decimate(
+            *self.curves[graph], xmin, xmax, graph.axes.bbox.width))
 
-        self.graph_ger_ieu.set_xdata(vx_ger_ieu)
-        self.graph_ger_ieu.set_ydata(vy_ger_ieu)
+    def on_xlim_changed(self, axes):
+        """
+        Decimate the curves again after zoom or pan.
+        :param axes: axes whose limits changed
+        :return: None
+        """
+        for graph in axes.get_lines():
+            if graph in self.curves:
+                self.decimate_graph(graph)
 
-        self.canvas.draw()
+    def on_resize(self, event):
+        """
+        Decimate all curves for the new size of the window.
+        :param event: resize event
+        :return: None
+        """
+        for graph in self.curves:
+            self.decimate_graph(graph)
 
     def _quit(self):
         """
         Quit the app
         :return: None
         """
+        self.pool.shutdown(wait=False, cancel_futures=True)
         root.quit()  # stops mainloop
         root.destroy()  # this is necessary on Windows to prevent
         # Fatal Python Error: PyEval_RestoreThread: NULL tstate
 
 
-root = Tk()
-root.wm_title("Numerical methods for solving ODEs")
-root.geometry("1920x1080")
-root.configure(background='#F0F0F0')
-app = App(root)
-root.mainloop()
+def main():
+    """
+    Open the window and run the gui until it is closed.
+    :return: None
+    """
+    global root
+    root = Tk()
+    root.wm_title("Numerical methods for solving ODEs")
+    root.geometry("1920x1080")
+    root.configure(background='#F0F0F0')
+    App(root)
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    # the guard keeps worker processes from opening their own windows
+    main()
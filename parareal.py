@@ -0,0 +1,166 @@
+# USAGE
+# Solve one long IVP in parallel in time with the Parareal method:
+#   solver = parareal.Parareal(rungekutta.RungeKutta(), euler.Euler())
+#   vx, vy = solver.get_graph(1, 10, 1000, 10 ** 6)
+#   print(solver.stats)
+# The interval is split into slices. A cheap coarse method guesses y at the
+# borders of the slices, then worker processes integrate all slices with the
+# accurate fine method at once, and the coarse method corrects the borders.
+# This repeats until the borders stop changing. After k iterations the first
+# k slices are exactly the fine solution, so the result converges to
+# fine.get_graph.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# state of a worker process, set by attach
+worker = {}
+
+
+def attach(method):
+    worker['method'] = method
+
+
+def fine_slice(x0, h, start, steps, y):
+    """
+    Integrate one slice with the fine method in a worker. The points are the
+    same as in get_graph of the whole interval.
+    :param x0: initial x of the whole interval
+    :param h: step size
+    :param start: index of the first point of the slice
+    :param steps: number of steps in the slice
+    :param y: y at the first point of the slice
+    :return: vy, seconds - y at the points of the slice and the time of the
+    integration
+    """
+    begin = time.perf_counter()
+    method = worker['method']
+    vy = np.empty(steps + 1)
+    vy[0] = y
+    for i in range(start, start + steps):
+        vy[i - start + 1] = y = method.find_next(x0 + i * h, y, h)
+    return vy, time.perf_counter() - begin
+
+
+class Parareal:
+
+    def __init__(self, fine, coarse, slices=None, coarse_steps=1, tol=1e-10,
+                 max_iter=None, workers=None):
+        """
+        :param fine: NumericalSolution giving the result
+        :param coarse: cheap NumericalSolution correcting the slice borders
+        :param slices: number of slices, 4 per worker if not given
+        :param coarse_steps: steps of the coarse method in one slice
+        :param tol: relative change of the borders at which the iterations
+        stop, 0 iterates until the result is exactly the fine solution
+        :param max_iter: maximum number of iterations, the number of slices
+        if not given
+        :param workers: number of processes, all cores if not given, 1
+        integrates in this process
+        """
+        self.fine = fine
+        self.coarse = coarse
+        self.workers = workers or os.cpu_count() or 1
+        self.slices = slices or 4 * self.workers
+        self.coarse_steps = coarse_steps
+        self.tol = tol
+        self.max_iter = max_iter
+        # iterations, wall time, estimated time of the sequential fine
+        # solution and their ratio of the last solution
+        self.stats = {}
+
+    def coarse_slice(self, x, y, width):
+        """
+        Propagate y over a slice with the coarse method.
+        :param x: x at the beginning of the slice
+        :param y: y at the beginning of the slice
+        :param width: width of the slice
+        :return: y at the end of the slice
+        """
+        h = width / float(self.coarse_steps)
+        for i in range(self.coarse_steps):
+            y = self.coarse.find_next(x + i * h, y, h)
+        return y
+
+    def get_graph(self, x0, y0, X, n):
+        """
+        Calculate the solution of the fine method in parallel in time.
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of fine steps
+        :return: vx, vy - arrays of the n + 1 points of the fine grid
+        """
+        begin = time.perf_counter()
+        h = (X - x0) / float(n)
+        count = max(1, min(self.slices, n))
+        bounds = np.linspace(0, n, count + 1).round().astype(int)
+        starts = bounds[:-1].tolist()
+        steps = np.diff(bounds).tolist()
+        max_iter = self.max_iter or count
+
+        # y at the borders of the slices, guessed with the coarse method
+        borders = [y0]
+        coarse = []
+        for start, m in zip(starts, steps):
+            coarse.append(self.coarse_slice(x0 + start * h, borders[-1],
+                                            m * h))
+            borders.append(coarse[-1])
+
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(self.workers, initializer=attach,
+                                       initargs=(self.fine,))
+        else:
+            attach(self.fine)
+        fine = [None] * count
+        serial = 0.0
+        iterations = 0
+        try:
+            while iterations < max_iter:
+                # the slices before the iteration number do not change
+                first = iterations
+                iterations += 1
+                args = [(x0, h, starts[j], steps[j], borders[j])
+                        for j in range(first, count)]
+                if pool is None:
+                    results = [fine_slice(*a) for a in args]
+                else:
+                    results = list(pool.map(fine_slice, *zip(*args)))
+                for j, (vy, seconds) in enumerate(results, first):
+                    fine[j] = vy
+                    if iterations == 1:
+                        serial += seconds
+
+                # correct the borders from left to right
+                change = 0.0
+                for j in range(first, count):
+                    previous = borders[j + 1]
+                    guess = self.coarse_slice(x0 + starts[j] * h,
+                                              borders[j], steps[j] * h)
+                    if j == first:
+                        # the fine solution of the slice is exact
+                        borders[j + 1] = fine[j][-1]
+                    else:
+                        borders[j + 1] = guess + fine[j][-1] - coarse[j]
+                    coarse[j] = guess
+                    change = max(change, abs(borders[j + 1] - previous) /
+                                 (1 + abs(borders[j + 1])))
+                if change <= self.tol:
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        vx = x0 + np.arange(n + 1) * h
+        vy = np.empty(n + 1)
+        for start, m, values in zip(starts, steps, fine):
+            vy[start:start + m + 1] = values
+        seconds = time.perf_counter() - begin
+        self.stats = {'iterations': iterations, 'slices': count,
+                      'workers': self.workers, 'seconds': seconds,
+                      'serial_seconds': serial, 'speedup': serial / seconds}
+        return vx, vy
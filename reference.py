@@ -0,0 +1,171 @@
+# USAGE
+# Reference solution for equations without a known exact solution. Every
+# IVP is solved once with the adaptive Dormand-Prince method at a tight
+# tolerance, later queries evaluate its dense output:
+#   solution = reference.ReferenceSolution("x * y - y ** 2")
+#   vx, vy = solution.exact(0, 1, 5, 100)
+# Methods use it instead of ExactSolution when they get another equation, so
+# local_error and total_error work for any equation. The accuracy is limited
+# by rtol and atol and by the 4th order dense output, the relative error is
+# about 1e-11 with the defaults.
+
+import numpy as np
+
+import rhs
+from exact_solution import ExactCache, ExactSolution
+
+# caches of the reference solutions, shared by all instances with the same
+# equation and tolerances
+caches = {}
+
+
+def shared_cache(equation, rtol, atol):
+    """
+    Get the cache for the reference solutions of an equation.
+    :param equation: right side f(x, y) of ODE
+    :param rtol: relative tolerance of the reference solutions
+    :param atol: absolute tolerance of the reference solutions
+    :return: ExactCache, a new one if the equation can not be identified
+    """
+    try:
+        key = (rhs.identity(equation), rtol, atol)
+    except ValueError:
+        return ExactCache()
+    if key not in caches:
+        caches[key] = ExactCache()
+    return caches[key]
+
+
+class Reference:
+    """
+    Dense solution of one IVP, integrated further when a query needs it.
+    Points left of x0 are solved backwards by a second Reference.
+    """
+
+    def __init__(self, method, x0, y0, direction=1.0):
+        """
+        :param method: DormandPrince instance
+        :param x0: initial x
+        :param y0: initial y
+        :param direction: 1 to integrate to the right of x0, -1 to the left
+        """
+        self.method = method
+        self.direction = direction
+        self.vx = np.array([x0], dtype=float)
+        self.vy = np.array([y0], dtype=float)
+        self.vq = np.empty((0, 4))
+        self.backward = None
+
+    def extend(self, X):
+        """
+        Integrate to X, at least doubling the solved interval so that
+        growing queries need few restarts. If the solution can not be
+        continued that far, e.g. near a singularity, it is integrated only
+        to X.
+        :param X: new end of the solved interval
+        :return: None
+        """
+        x = self.vx[-1]
+        d = self.direction
+        target = d * max(d * X, d * (x + (x - self.vx[0])))
+        try:
+            vx, vy, vq = self.method.solve(x, self.vy[-1], target)
+        except ValueError:
+            if target == X:
+                raise
+            vx, vy, vq = self.method.solve(x, self.vy[-1], X)
+        self.vx = np.concatenate((self.vx, vx[1:]))
+        self.vy = np.concatenate((self.vy, vy[1:]))
+        self.vq = np.concatenate((self.vq, vq))
+
+    @property
+    def nbytes(self):
+        """
+        :return: size of the solved points and coefficients in bytes
+        """
+        size = self.vx.nbytes + self.vy.nbytes + self.vq.nbytes
+        if self.backward is not None:
+            size += self.backward.nbytes
+        return size
+
+    def __call__(self, x):
+        """
+        Evaluate the solution, every point is found by binary search.
+        :param x: number or array of points
+        :return: values of the solution at x
+        """
+        x = np.asarray(x, dtype=float)
+        if x.size == 0:
+            return np.empty(x.shape)
+        left = x < self.vx[0]
+        if self.direction > 0 and left.any():
+            if self.backward is None:
+                self.backward = Reference(self.method, self.vx[0],
+                                          self.vy[0], -1.0)
+            y = np.empty(x.shape)
+            y[left] = self.backward(x[left])
+            y[~left] = self(x[~left])
+            return y
+        far =x.max() if self.direction > 0 else x.min()
+        if self.direction * (far - self.vx[-1]) > 0:
+            self.extend(far)
+        if len(self.vq) == 0:
+            return np.full(x.shape, self.vy[0])
+        return self.method.interpolate(self.vx, self.vy, self.vq, x)
+
+
+class ReferenceSolution(ExactSolution):
+
+    def __init__(self, equation, rtol=1e-12, atol=1e-14, cache=None):
+        """
+        :param equation: right side f(x, y) of ODE
+        :param rtol: relative tolerance of the reference solutions
+        :param atol: absolute tolerance of the reference solutions
+        :param cache: ExactCache for the solutions and the grids, the cache
+        of the equation and tolerances if not given
+        """
+        super().__init__(shared_cache(equation, rtol, atol)
+                         if cache is None else cache)
+        self.equation = equation
+        self.rtol = rtol
+        self.atol = atol
+        self.integrator = None
+
+    def solve_ivp(self, x0, y0):
+        """
+        Get the reference solution of given IVP, it replaces the constant
+        of the exact solution.
+        :param x0: initial point x0 (number or array)
+        :param y0: initial point y0 (number or array)
+        :return: Reference or array of them
+        """
+        if np.ndim(x0) or np.ndim(y0):
+            x0, y0 = np.broadcast_arrays(x0, y0)
+            references = np.empty(x0.shape, dtype=object)
+            for i in np.ndindex(x0.shape):
+                references[i] = self.solve_ivp(float(x0[i]), float(y0[i]))
+            return references
+        if self.integrator is None:
+            # imported here, dormand_prince imports equation which imports
+            # this module
+            import dormand_prince
+            self.integrator = dormand_prince.DormandPrince(
+                self.equation, self.rtol, self.atol)
+        return self.cache.get(('reference', x0, y0),
+                              lambda: Reference(self.integrator, x0, y0))
+
+    def general_solution(self, c, x):
+        """
+        Evaluate reference solutions.
+        :param c: Reference or array of them returned by solve_ivp
+        :param x: the x-coordinate (number or numpy array)
+        :return: y coordinate based on x coordinate and c
+        """
+        if not isinstance(c, np.ndarray):
+            return c(x)
+        c, x = np.broadcast_arrays(c, np.asarray(x, dtype=float))
+        y = np.empty(x.shape)
+        for reference in set(c.ravel().tolist()):
+            mask = c == reference
+            y[mask] = reference(x[mask])
+        return y
@@ -0,0 +1,253 @@
+# USAGE
+# Compile the right side f(x, y) of an ODE y' = f(x, y) given as a string,
+# e.g. "sqrt(y - x) / sqrt(x) + 1", into a kernel which works both on numbers
+# and on numpy arrays. Kernels are compiled with numba when it is installed.
+# Systems are given as a list of expressions, one per component, where
+# components are referenced as y[0], y[1], ... e.g. ["y[1]", "-y[0]"].
+
+import ast
+import hashlib
+import math
+import types
+
+import numpy as np
+
+FUNCTIONS = {
+    'sqrt': np.sqrt, 'exp': np.exp, 'log': np.log, 'log10': np.log10,
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'arcsin': np.arcsin,
+    'arccos': np.arccos, 'arctan': np.arctan, 'sinh': np.sinh,
+    'cosh': np.cosh, 'tanh': np.tanh, 'abs': np.abs,
+}
+# the same functions for Python numbers, several times faster than numpy on
+# single floats
+MATH_FUNCTIONS = {
+    'sqrt': math.sqrt, 'exp': math.exp, 'log': math.log,
+    'log10': math.log10, 'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'arcsin': math.asin, 'arccos': math.acos, 'arctan': math.atan,
+    'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh, 'abs': abs,
+}
+CONSTANTS = {'pi': np.pi, 'e': np.e}
+# types of x and y evaluated with MATH_FUNCTIONS
+SCALARS = frozenset((int, float))
+VARIABLES = ('x', 'y')
+# arithmetic operators allowed in expressions
+OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+             ast.Pow, ast.UAdd, ast.USub)
+
+_kernels = {}
+
+
+def validate(source):
+    """
+    Parse the expression and check that it only uses x, y, numbers,
+    arithmetic operators and the supported functions.
+    :param source: expression of the right side
+    :return: parsed expression tree
+    """
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as e:
+        raise ValueError("Invalid expression %r: %s" % (source, e.msg))
+    allowed = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name,
+               ast.Load, ast.Constant, ast.Subscript) + OPERATORS
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and not (
+                isinstance(node.value, ast.Name) and node.value.id == 'y'
+                and isinstance(node.slice, ast.Constant)
+                and type(node.slice.value) is int):
+            raise ValueError("Only y[<integer>] subscripts are supported in "
+                             "%r" % source)
+        if not isinstance(node, allowed):
+            raise ValueError("Unsupported syntax in %r: %s"
+                             % (source, type(node).__name__))
+        if isinstance(node, ast.Constant) and \
+                type(node.value) not in (int, float):
+            raise ValueError("Unsupported constant in %r: %r"
+                             % (source, node.value))
+        if isinstance(node, ast.Call) and not (
+                isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+                and len(node.args) == 1 and not node.keywords):
+            raise ValueError("Unsupported function call in %r" % source)
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS \
+                and node.id not in CONSTANTS and node.id not in VARIABLES:
+            raise ValueError("Unknown name in %r: %s" % (source, node.id))
+    return tree
+
+
+def jit(kernel, components=None):
+    """
+    Compile the kernel with numba if it is installed.
+    :param kernel: python function of x and y
+    :param components: size of y for systems, None for scalar equations
+    :return: numba compiled kernel or the kernel itself
+    """
+    try:
+        import numba
+    except ImportError:
+        return kernel
+    try:
+        compiled = numba.njit(kernel)
+        if components is None:
+            compiled(1.0, 2.0)
+            compiled(np.ones(1), np.full(1, 2.0))
+        else:
+            compiled(1.0, np.ones(components))
+    except Exception:
+        return kernel
+    return compiled
+
+
+def reduce_order(expression, order):
+    """
+    Rewrite the equation y^(order) = g(x, y, y', ...) as a first order
+    system. Derivatives y, y', y'', ... are the components y[0], y[1], ...
+    :param expression: right side g with derivatives written as y[k]
+    :param order: order of the equation
+    :return: list of expressions of the equivalent system
+    """
+    return ['y[%d]' % k for k in range(1, order)] + [expression]
+
+
+def identity(f):
+    """
+    Get a stable description of the right side which does not change
+    between runs, e.g. to use it in keys of stored results. Callables are
+    described by their code and the values of their defaults, closures and
+    globals.
+    :param f: expression, list of expressions or callable
+    :return: string describing f
+    :raise ValueError: if a value used by a callable can not be described
+    """
+    if isinstance(f, str):
+        return ' '.join(f.split())
+    if callable(f):
+        return '%s.%s:%s' % (getattr(f, '__module__', ''),
+                             getattr(f, '__qualname__', repr(f)),
+                             hashlib.sha1(describe(f).encode()).hexdigest())
+    return '[%s]' % ', '.join(identity(e) for e in f)
+
+
+def describe(value, depth=0):
+    """
+    Describe a value used by a right side without memory addresses.
+    :param value: constant, module, array, function or container
+    :param depth: number of enclosing functions
+    :return: string describing value
+    :raise ValueError: if the value can not be described
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str,
+                                           bytes, np.number)):
+        return repr(value)
+    if isinstance(value, types.ModuleType):
+        return 'module ' + value.__name__
+    if isinstance(value, np.ndarray):
+        return 'array %s %s %s' % (value.dtype, value.shape, hashlib.sha1(
+            np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, (tuple, list)):
+        return '(%s)' % ', '.join(describe(v, depth) for v in value)
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join('%s: %s' % (describe(k, depth),
+                                              describe(v, depth))
+                                  for k, v in sorted(value.items(),
+                                                     key=repr))
+    if isinstance(value, (types.BuiltinFunctionType, np.ufunc, type)):
+        return '%s.%s' % (getattr(value, '__module__', None) or 'numpy',
+                          value.__name__)
+    if isinstance(value, types.FunctionType) and depth < 4:
+        code = value.__code__
+        parts = [describe_code(code),
+                 describe(value.__defaults__, depth + 1),
+                 describe(value.__kwdefaults__, depth + 1)]
+        for cell in value.__closure__ or ():
+            try:
+                parts.append(describe(cell.cell_contents, depth + 1))
+            except ValueError:
+                parts.append('empty cell')
+        for name in global_names(code):
+            if name in value.__globals__:
+                parts.append('%s = %s' % (name, describe(
+                    value.__globals__[name], depth + 1)))
+        return '; '.join(parts)
+    raise ValueError("Can not describe %r of the right side" % (value,))
+
+
+def describe_code(code):
+    consts = [describe_code(c) if isinstance(c, types.CodeType) else repr(c)
+              for c in code.co_consts]
+    return '%s %s' % (code.co_code.hex(), ', '.join(consts))
+
+
+def global_names(code):
+    names = set(code.co_names)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            names |= global_names(c)
+    return sorted(names)
+
+
+def compile_rhs(f, use_jit=True):
+    """
+    Get a kernel computing the right side of an ODE.
+    :param f: expression of x and y as a string, list of expressions of a
+    system, or a callable f(x, y)
+    :param use_jit: try to compile the kernel with numba
+    :return: callable f(x, y) accepting numbers and numpy arrays, for systems
+    y and the result have the components along the first axis
+    """
+    if callable(f):
+        return f
+    if isinstance(f, str):
+        source = ' '.join(f.split())
+    else:
+        source = '[%s]' % ', '.join(' '.join(e.split()) for e in f)
+    key = (hashlib.sha1(source.encode()).hexdigest(), use_jit)
+    if key not in _kernels:
+        if isinstance(f, str):
+            validate(source)
+            components = None
+        else:
+            for expression in f:
+                validate(' '.join(expression.split()))
+            source = 'np_array(%s)' % source
+            components = len(f)
+        namespace = dict(FUNCTIONS, np_array=np.array, **CONSTANTS)
+        kernel = eval('lambda x, y: ' + source, namespace)
+        compiled = jit(kernel, components) if use_jit else kernel
+        if compiled is kernel and components is None:
+            compiled = scalar_kernel(source)
+        _kernels[key] = compiled
+    return _kernels[key]
+
+
+def scalar_kernel(source):
+    """
+    Compile a scalar expression into a kernel which evaluates Python numbers
+    with the math module and numpy arrays with numpy. Where math raises or
+    gives a complex number, numpy gives nan or inf, so those points are
+    evaluated with numpy too.
+    :param source: validated expression of x and y
+    :return: callable f(x, y) accepting numbers and numpy arrays
+    """
+    tree = ast.parse(source, mode='eval')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in FUNCTIONS:
+            node.id = 'math_' + node.id
+    lines = ['def kernel(x, y):',
+             '    if type(x) in SCALARS and type(y) in SCALARS:',
+             '        try:',
+             '            value = ' + ast.unparse(tree),
+             '        except (ArithmeticError, ValueError):',
+             '            pass',
+             '        else:']
+    if any(isinstance(node, ast.Pow) for node in ast.walk(tree)):
+        # only powers of negative numbers are complex
+        lines += ['            if type(value) is not complex:',
+                  '                return value']
+    else:
+        lines.append('            return value')
+    lines.append('    return ' + source)
+    namespace = dict(FUNCTIONS, SCALARS=SCALARS, **CONSTANTS)
+    namespace.update(('math_' + name, function)
+                     for name, function in MATH_FUNCTIONS.items())
+    exec('\n'.join(lines), namespace)
+    return namespace['kernel']
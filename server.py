@@ -0,0 +1,317 @@
+# USAGE
+# Keep the methods loaded in a local server and solve IVPs over HTTP:
+#   python server.py --port 8765            (or --unix /tmp/ode.sock)
+#   curl -d '{"method": "runge_kutta", "x0": 1, "y0": 10, "X": 15, "n": 100}' \
+#       http://127.0.0.1:8765/solve
+#   curl http://127.0.0.1:8765/metrics
+# /solve streams the solution as JSON lines {"i": ..., "x": [...], "y": [...]}
+# with at most --chunk-size points each and ends with {"done": true, ...}.
+# Requests for the same method and n which arrive within --window seconds are
+# solved together as one batch with get_graph_batch, adaptive methods such as
+# dormand_prince solve every IVP with get_graph. From python use solve:
+#   vx, vy = server.solve(method='euler', x0=1, y0=10, X=15, n=100)
+
+import argparse
+import asyncio
+import collections
+import http.client
+import json
+import sys
+import time
+
+import numpy as np
+
+from cli import METHODS
+from equation import EQUATION
+
+# number of the latest requests used for the latency metrics
+LATENCY_WINDOW = 1000
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class Batcher:
+    """
+    Collects requests for the same method and number of steps and solves
+    them as one batch.
+    """
+
+    def __init__(self, equation=EQUATION, window=0.005, max_batch=1024,
+                 max_n=10 ** 6):
+        """
+        :param equation: right side f(x, y) of ODE
+        :param window: time in seconds to wait for more requests of a batch
+        :param max_batch: maximum number of IVPs in one batch
+        :param max_n: maximum number of steps of a request
+        """
+        self.methods = {name: cls(equation=equation)
+                        for name, cls in METHODS.items()}
+        self.window = window
+        self.max_batch = max_batch
+        self.max_n = max_n
+        self.pending = {}
+        self.depth = 0
+        self.requests = 0
+        self.batches = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def solve(self, name, x0, y0, X, n):
+        """
+        Solve an IVP together with the other requests of its batch.
+        :param name: name of the method in cli.METHODS
+        :param x0: initial x
+        :param y0: initial y
+        :param X: the right side of an interval
+        :param n: number of steps
+        :return: vx, vy, batch - arrays of the solution and the size of the
+        batch it was solved in
+        """
+        if name not in self.methods:
+            raise ValueError("Unknown method %r" % name)
+        if n < 1:
+            raise ValueError("The number of steps must be positive")
+        if n > self.max_n:
+            raise ValueError("The number of steps must be at most %d"
+                             % self.max_n)
+        start = time.perf_counter()
+        self.requests += 1
+        self.depth += 1
+        key = (name, n)
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.get(key)
+        if batch is None:
+            batch = self.pending[key] = []
+            asyncio.get_running_loop().call_later(self.window, self.dispatch,
+                                                  key)
+        batch.append(((x0, y0, X), future))
+        if len(batch) >= self.max_batch:
+            self.dispatch(key)
+        try:
+            return await future
+        finally:
+            self.depth -= 1
+            self.latencies.append(time.perf_counter() - start)
+
+    def dispatch(self, key):
+        batch = self.pending.pop(key, None)
+        if batch:
+            asyncio.ensure_future(self.run(key, batch))
+
+    async def run(self, key, batch):
+        name, n = key
+        x0, y0, X = np.array([ivp for ivp, _ in batch], dtype=float).T
+        self.batches += 1
+        try:
+            # the integration runs in a thread, so the server keeps
+            # accepting requests for the next batch
+            vx, vy = await asyncio.get_running_loop().run_in_executor(
+                None, self.integrate, self.methods[name], x0, y0, X, n)
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for row, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((vx[row], vy[row], len(batch)))
+
+    def integrate(self, method, x0, y0, X, n):
+        """
+        Solve a batch of IVPs, adaptive methods solve every IVP on its own.
+        :param method: NumericalSolution instance
+        :param x0: array of initial x
+        :param y0: array of initial y
+        :param X: array of the right sides of the intervals
+        :param n: number of steps
+        :return: vx, vy - arrays with one row per IVP
+        """
+        if not method.adaptive:
+            return method.get_graph_batch(x0, y0, X, n)
+        rows = [method.get_graph(*ivp, n) for ivp in zip(x0, y0, X)]
+        return (np.array([vx for vx, _ in rows]),
+                np.array([vy for _, vy in rows]))
+
+    def metrics(self):
+        """
+        :return: dict with the queue depth, counts and latencies in seconds
+        """
+        latencies = np.array(self.latencies)
+        result = {'queue_depth': self.depth, 'requests': self.requests,
+                  'batches': self.batches,
+                  'mean_batch': self.requests / self.batches
+                  if self.batches else 0.0}
+        if latencies.size:
+            result.update(latency_mean=latencies.mean(),
+                          latency_p50=np.percentile(latencies, 50),
+                          latency_p95=np.percentile(latencies, 95),
+                          latency_max=latencies.max())
+        return result
+
+
+class Server:
+
+    def __init__(self, batcher, chunk_size=4096):
+        """
+        :param batcher: Batcher solving the requests
+        :param chunk_size: maximum number of points in one streamed line
+        """
+        self.batcher = batcher
+        self.chunk_size = chunk_size
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            parts = request.decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                await self.respond(writer, 400,
+                                   {'error': "Invalid Content-Length"})
+                return
+            body = await reader.readexactly(length)
+            if len(parts) < 2:
+                await self.respond(writer, 400, {'error': "Bad request"})
+            elif parts[1] == '/metrics':
+                await self.respond(writer, 200, self.batcher.metrics())
+            elif parts[1] != '/solve':
+                await self.respond(writer, 404, {'error': "Not found"})
+            elif parts[0] != 'POST':
+                await self.respond(writer, 405, {'error': "Use POST"})
+            else:
+                await self.solve(writer, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def solve(self, writer, body):
+        try:
+            params = json.loads(body)
+            if not isinstance(params, dict):
+                raise ValueError("The body must be a JSON object")
+            n = params['n']
+            if isinstance(n, bool) or not isinstance(n, (int, float)) or \
+                    n != int(n):
+                raise ValueError("The number of steps must be an integer")
+            ivp = (float(params['x0']), float(params['y0']),
+                   float(params['X']), int(n))
+        except (ValueError, KeyError, TypeError, OverflowError) as error:
+            await self.respond(writer, 400, {'error': str(error)})
+            return
+        try:
+            vx, vy, batch = await self.batcher.solve(
+                params.get('method', 'runge_kutta'), *ivp)
+        except ValueError as error:
+            await self.respond(writer, 400, {'error': str(error)})
+            return
+        except Exception as error:
+            await self.respond(writer, 500, {'error': "%s: %s" % (
+                type(error).__name__, error)})
+            return
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: application/x-ndjson\r\n'
+                     b'Transfer-Encoding: chunked\r\n'
+                     b'Connection: close\r\n\r\n')
+        for start in range(0, len(vx), self.chunk_size):
+            stop = start + self.chunk_size
+            await self.send_chunk(writer, {'i': start,
+                                           'x': vx[start:stop].tolist(),
+                                           'y': vy[start:stop].tolist()})
+        await self.send_chunk(writer, {'done': True, 'batch': batch})
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def send_chunk(self, writer, data):
+        line = (json.dumps(data) + '\n').encode()
+        writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+        await writer.drain()
+
+    async def respond(self, writer, status, data):
+        body = (json.dumps(data) + '\n').encode()
+        writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: %d\r\nConnection: close\r\n\r\n%s'
+                     % (status, REASONS[status].encode(), len(body), body))
+        await writer.drain()
+
+
+def solve(method='runge_kutta', x0=1, y0=10, X=15, n=10, host='127.0.0.1',
+          port=8765):
+    """
+    Solve an IVP with a running server.
+    :param method: name of the method in cli.METHODS
+    :param x0: initial x
+    :param y0: initial y
+    :param X: the right side of an interval
+    :param n: number of steps
+    :param host: address of the server
+    :param port: port of the server
+    :return: vx, vy - arrays of the solution
+    """
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        connection.request('POST', '/solve', json.dumps(
+            {'method': method, 'x0': x0, 'y0': y0, 'X': X, 'n': n}),
+            {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise ValueError(json.loads(response.read())['error'])
+        vx = np.empty(n + 1)
+        vy = np.empty(n + 1)
+        for line in response:
+            chunk = json.loads(line)
+            if 'i' in chunk:
+                stop = chunk['i'] + len(chunk['x'])
+                vx[chunk['i']:stop] = chunk['x']
+                vy[chunk['i']:stop] = chunk['y']
+        return vx, vy
+    finally:
+        connection.close()
+
+
+async def serve(args):
+    batcher = Batcher(args.equation, args.window, args.max_batch,
+                      args.max_n)
+    server = Server(batcher, args.chunk_size)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle, args.unix)
+    else:
+        listener = await asyncio.start_server(server.handle, args.host,
+                                              args.port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Local server solving IVPs with batched requests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on a Unix socket instead")
+    parser.add_argument('--equation', default=EQUATION,
+                        help="right side f(x, y) of ODE")
+    parser.add_argument('--window', type=float, default=0.005,
+                        help="seconds to wait for requests of a batch")
+    parser.add_argument('--max-batch', type=int, default=1024)
+    parser.add_argument('--max-n', type=int, default=10 ** 6,
+                        help="maximum number of steps of a request")
+    parser.add_argument('--chunk-size', type=int, default=4096,
+                        help="maximum number of points in one line")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
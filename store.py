@@ -0,0 +1,146 @@
+# USAGE
+# Keep computed trajectories and error sweeps on disk between runs:
+#   results = store.ResultStore()
+#   vx, vy = results.cached(method, 'get_graph', (x0, y0, X, n),
+#                           lambda: method.get_graph(x0, y0, X, n))
+# Every result is a directory of .npy files named by the hash of the method,
+# the equation, the IVP and the grid. Results are loaded as memory-mapped
+# arrays. The least recently used results are removed when the store grows
+# above its size limit.
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache',
+                            'ode_solutions')
+
+
+class ResultStore:
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=1 << 30):
+        """
+        :param path: directory of the store
+        :param max_bytes: maximum total size of stored results
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, method, kind, params):
+        """
+        Get the name of a result.
+        :param method: NumericalSolution instance
+        :param kind: name of the computation, e.g. 'total_error'
+        :param params: IVP and grid as a tuple of numbers or arrays
+        :return: hex digest identifying the result
+        :raise ValueError: if the equation of the method can not be
+        identified
+        """
+        description = json.dumps(
+            {'method': method.identity(), 'kind': kind,
+             'params': [np.asarray(p).tolist() for p in params]},
+            sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def load(self, key):
+        """
+        :param key: name of the result
+        :return: tuple of read-only memory-mapped arrays or None
+        """
+        directory = os.path.join(self.path, key)
+        try:
+            names = sorted(os.listdir(directory), key=lambda name:
+                           int(name.split('.')[0]))
+            arrays = tuple(np.load(os.path.join(directory, name),
+                                   mmap_mode='r') for name in names)
+            os.utime(directory)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def save(self, key, arrays):
+        """
+        Write the arrays of a result and evict old results if needed.
+        :param key: name of the result
+        :param arrays: tuple of arrays
+        :return: None
+        """
+        temporary = os.path.join(self.path, '.tmp-' + uuid.uuid4().hex)
+        os.makedirs(temporary)
+        for i, array in enumerate(arrays):
+            np.save(os.path.join(temporary, '%d.npy' % i),
+                    np.asarray(array))
+        try:
+            # a complete result appears at once, also for other processes
+            os.rename(temporary, os.path.join(self.path, key))
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def cached(self, method, kind, params, compute):
+        """
+        Load a result or compute and save it.
+        :param method: NumericalSolution instance
+        :param kind: name of the computation
+        :param params: IVP and grid as a tuple of numbers or arrays
+        :param compute: function without arguments returning a tuple of
+        arrays
+        :return: tuple of arrays
+        """
+        try:
+            key = self.key(method, kind, params)
+        except ValueError:
+            # the right side uses values which can not be told apart
+            return compute()
+        arrays = self.load(key)
+        if arrays is None:
+            arrays = compute()
+            self.save(key, arrays)
+        return arrays
+
+    def size(self):
+        """
+        :return: total size of stored results in bytes
+        """
+        return sum(size for _, _, size in self.entries())
+
+    def entries(self):
+        """
+        :return: list of (last use time, directory, size) of every result
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            directory = os.path.join(self.path, name)
+            if name.startswith('.') or not os.path.isdir(directory):
+                continue
+            try:
+                size = sum(entry.stat().st_size
+                           for entry in os.scandir(directory))
+                entries.append((os.stat(directory).st_mtime, directory,
+                                size))
+            except OSError:
+                continue  # removed by another process
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used results until the store fits into
+        max_bytes.
+        :return: None
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, _, size in entries)
+        for _, directory, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
@@ -0,0 +1,177 @@
+# USAGE
+# Solve every combination of IVP, method and number of steps on all cores:
+#   table, vy = sweep.run([euler.Euler(), rungekutta.RungeKutta()],
+#                         [(1, 10, 15), (1, 11, 15)], range(10, 200))
+# table maps column names (method, x0, y0, X, n, y, error, offset) to arrays
+# with one row per combination, y is the value at X and error the total
+# error. With trajectories=True vy holds the solutions of all rows one
+# after another, the solution of a row starts at its offset.
+# The combinations are split into chunks of about equal cost, estimated as
+# the number of steps times the evaluations of f per step. Workers write the
+# results straight into shared memory, so only the small chunk descriptions
+# are pickled.
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# number of chunks per worker, more chunks balance better but cost more
+# scheduling
+CHUNKS_PER_WORKER = 4
+
+# state of a worker process, set by attach
+worker = {}
+
+
+def plan(costs, ns, ivps, chunk_count):
+    """
+    Split the combinations into chunks of about equal cost.
+    :param costs: evaluations of f per step of every method
+    :param ns: array of numbers of steps
+    :param ivps: number of IVPs
+    :param chunk_count: wanted number of chunks
+    :return: list of chunks, every chunk is a list of units (method index,
+    index of n, first IVP, last IVP + 1) solved as one batch
+    """
+    total = sum(costs) * ivps * float(ns.sum())
+    limit = total / chunk_count
+    units = []
+    for m, cost in enumerate(costs):
+        for j, n in enumerate(ns.tolist()):
+            # IVPs with the same method and n are solved as one batch
+            batch = max(1, min(ivps, int(limit // (cost * n))))
+            for start in range(0, ivps, batch):
+                stop = min(start + batch, ivps)
+                units.append((cost * n * (stop - start), (m, j, start, stop)))
+
+    # the longest processing time first: every unit goes to the cheapest
+    # chunk so far
+    chunks = [(0.0, k, []) for k in range(min(chunk_count, len(units)))]
+    for cost, unit in sorted(units, key=lambda item: -item[0]):
+        load, k, chunk = heapq.heappop(chunks)
+        chunk.append(unit)
+        heapq.heappush(chunks, (load + cost, k, chunk))
+    return [chunk for _, _, chunk in sorted(chunks, key=lambda c: -c[0])]
+
+
+def attach(methods, ivps, ns, buffers, exact):
+    """
+    Initialize a worker with the parameters of the sweep and views of the
+    shared result buffers.
+    :param methods: list of NumericalSolution instances
+    :param ivps: array of shape (count, 3) with x0, y0, X in every row
+    :param ns: array of numbers of steps
+    :param buffers: dict mapping result names to (shared memory name, size)
+    :param exact: calculate the total error
+    :return: None
+    """
+    worker.clear()
+    worker.update(methods=methods, ivps=ivps, ns=ns, exact=exact, memory=[])
+    for name, (memory_name, size) in buffers.items():
+        memory = shared_memory.SharedMemory(name=memory_name)
+        worker['memory'].append(memory)
+        worker[name] = np.ndarray(size, dtype=float, buffer=memory.buf)
+
+
+def solve(chunk):
+    """
+    Solve the units of a chunk in the worker and write the results.
+    :param chunk: list of units made by plan
+    :return: number of solved combinations
+    """
+    methods, ivps, ns = worker['methods'], worker['ivps'], worker['ns']
+    offsets = worker.get('offsets')
+    solved = 0
+    for m, j, start, stop in chunk:
+        n = int(ns[j])
+        x0, y0, X = ivps[start:stop].T
+        vx, vy = methods[m].get_graph_batch(x0, y0, X, n)
+        rows = (m * len(ivps) + np.arange(start, stop)) * len(ns) + j
+        worker['y'][rows] = vy[:, -1]
+        if worker['exact']:
+            solution = methods[m].exact_solution
+            c = solution.solve_ivp(x0, y0)
+            vy_ex = solution.general_solution(c[:, None], vx)
+            vy_ex[:, 0] = y0
+            worker['error'][rows] = np.max(np.fabs(vy_ex - vy), axis=1)
+        if offsets is not None:
+            positions = offsets[rows, None].astype(int) + np.arange(n + 1)
+            worker['vy'][positions] = vy
+        solved += len(rows)
+    return solved
+
+
+def run(methods, ivps, ns, workers=None, trajectories=False, exact=True,
+        names=None):
+    """
+    Solve every combination of method, IVP and number of steps.
+    :param methods: list of NumericalSolution instances
+    :param ivps: list of (x0, y0, X) tuples
+    :param ns: numbers of steps
+    :param workers: number of processes, all cores if not given, 1 solves
+    in this process
+    :param trajectories: also return the solutions on all grid points
+    :param exact: calculate the total error with the exact solution of the
+    methods
+    :param names: names of the methods in the table, their name properties
+    if not given
+    :return: table, vy - dict of columns with one row per combination in
+    the order of methods, ivps and ns, and the solutions of all rows or None
+    """
+    ivps = np.asarray(ivps, dtype=float).reshape(-1, 3)
+    ns = np.asarray(ns, dtype=int).ravel()
+    if names is None:
+        names = [method.name for method in methods]
+    rows = len(methods) * len(ivps) * len(ns)
+    workers = workers or os.cpu_count() or 1
+
+    table = {
+        'method': np.repeat(names, len(ivps) * len(ns)),
+        'x0': np.tile(np.repeat(ivps[:, 0], len(ns)), len(methods)),
+        'y0': np.tile(np.repeat(ivps[:, 1], len(ns)), len(methods)),
+        'X': np.tile(np.repeat(ivps[:, 2], len(ns)), len(methods)),
+        'n': np.tile(ns, len(methods) * len(ivps)),
+    }
+    offsets = np.cumsum(table['n'] + 1) - (table['n'] + 1)
+    sizes = {'y': rows, 'error': rows}
+    if trajectories:
+        table['offset'] = offsets
+        sizes['offsets'] = rows
+        sizes['vy'] = int((table['n'] + 1).sum())
+
+    memory = {name: shared_memory.SharedMemory(create=True,
+                                               size=max(size, 1) * 8)
+              for name, size in sizes.items()}
+    try:
+        buffers = {name: (memory[name].name, size)
+                   for name, size in sizes.items()}
+        initargs = (methods, ivps, ns, buffers, exact)
+        chunks = plan([method.evaluations for method in methods], ns,
+                      len(ivps), workers * CHUNKS_PER_WORKER)
+        attach(*initargs)
+        if trajectories:
+            worker['offsets'][:] = offsets
+        if workers == 1:
+            for chunk in chunks:
+                solve(chunk)
+        else:
+            with ProcessPoolExecutor(workers, initializer=attach,
+                                     initargs=initargs) as pool:
+                list(pool.map(solve, chunks))
+        table['y'] = worker['y'].copy()
+        table['error'] = worker['error'].copy() if exact \
+            else np.full(rows, np.nan)
+        vy = worker['vy'].copy() if trajectories else None
+    finally:
+        # the views must be released before the memory is closed
+        attached = worker.pop('memory', [])
+        worker.clear()
+        for shared in attached:
+            shared.close()
+        for shared in memory.values():
+            shared.close()
+            shared.unlink()
+    return table, vy
@@ -0,0 +1,78 @@
+# USAGE
+# Compact results backed by float64 arrays:
+#   solution = method.trajectory(1, 10, 15, 100)
+#   vx, vy = solution          # unpacks like the (vx, vy) pairs
+#   np.asarray(solution)       # y without copying
+#   memoryview(solution.y)     # buffer of y, memoryview(solution) on 3.12+
+#   axes.plot(solution.x, solution.y)
+# A result is not a sequence of points, it iterates over the two arrays only,
+# so it has no len(). The number of points is solution.y.size.
+# The x grid is read-only and shared by all results on the same grid, e.g.
+# the solutions and the local errors of all methods.
+
+import numpy as np
+
+
+class Trajectory:
+    """
+    Values of a solution on a grid with a description of how it was
+    calculated.
+    """
+
+    __slots__ = ('x', 'y', 'method', 'h', 'n', 'f_evals')
+
+    def __init__(self, x, y, method=None, h=None, n=None, f_evals=None):
+        """
+        :param x: read-only float64 array of the grid
+        :param y: float64 array of the values, y[i] is at x[i]
+        :param method: name of the method
+        :param h: step size
+        :param n: number of steps
+        :param f_evals: number of evaluated points of f
+        """
+        self.x = x
+        self.y = y
+        self.method = method
+        self.h = h
+        self.n = n
+        self.f_evals = f_evals
+
+    def __iter__(self):
+        return iter((self.x, self.y))
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return np.array(self.y, dtype=dtype)
+        return np.asarray(self.y, dtype=dtype)
+
+    def __buffer__(self, flags):
+        # buffer protocol of Python 3.12, older versions take the buffer of y
+        return memoryview(self.y)
+
+    @property
+    def nbytes(self):
+        """
+        :return: size of the values in bytes, the shared grid is not counted
+        """
+        return self.y.nbytes
+
+    def __repr__(self):
+        return '%s(method=%r, n=%r, h=%r, f_evals=%r)' % (
+            type(self).__name__, self.method, self.n, self.h, self.f_evals)
+
+
+class ErrorCurve(Trajectory):
+    """
+    Absolute error of a solution on a grid.
+    """
+
+    __slots__ = ('kind',)
+
+    def __init__(self, x, y, method=None, h=None, n=None, f_evals=None,
+                 kind='local'):
+        """
+        :param kind: 'local' for the error of single steps from the exact
+        solution, 'global' for the error of the solution
+        """
+        super().__init__(x, y, method, h, n, f_evals)
+        self.kind = kind
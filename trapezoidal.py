@@ -0,0 +1,18 @@
+# Usage Get the approximate solution of ODE using the implicit trapezoidal
+# rule and corresponding errors compare to exact solution
+
+from implicit import ImplicitSolution
+
+
+class Trapezoidal(ImplicitSolution):
+
+    order = 2
+
+    def find_next(self, x0, y0, h):
+        m1 = self.f(x0, y0)
+        return self.newton(x0 + h, y0 + h * m1 / 2, h / 2, y0 + h * m1)
+
+    def find_next_into(self, x0, y0, h, out):
+        m1 = self.f(x0, y0)
+        out[...] = self.newton(x0 + h, y0 + h * m1 / 2, h / 2, y0 + h * m1,
+                               system=True)